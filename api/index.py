@@ -1,17 +1,30 @@
 # api/index.py
 import json
 import os
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-import requests
-from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageStat
+from io import BytesIO, StringIO
 import textwrap
 import math
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify
 import shutil
 import time
 import re # Ajouté pour slugify
 import unicodedata # Ajouté pour slugify
 import traceback # Était utilisé, mais pas importé explicitement, ajout pour la clarté
+import threading
+import hashlib
+import functools
+import sqlite3
+import contextlib
+import uuid
+import mimetypes
+import bisect
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from urllib.parse import urlparse
+# Imports différés (démarrage à froid) : requests, zipfile, cProfile/pstats et le pool de processus
+# ne sont chargés qu'à leur première utilisation, ou par warm_up().
 
 # --- Configuration ---
 # Sur Vercel, les fichiers temporaires doivent être écrits dans /tmp
@@ -50,19 +63,241 @@ IMAGE_SLIDE_TEXT_MARGIN = 50
 FOOTER_BAND_HEIGHT = 100
 FOOTER_PADDING = 30
 STAR_TEXT_PADDING = 10
+PLACEHOLDER_FONT_SIZE = 50
+PLACEHOLDER_BG_COLOR = (220, 220, 220)
+PLACEHOLDER_TEXT_COLOR = (100, 100, 100)
+AMENITY_BOX_PADDING_X = 40
+AMENITY_BOX_PADDING_Y = 25
+AMENITY_BOX_RADIUS = 30
+LAYER_CACHE_SIZE = 64 # Calques (bandeau, encadrés d'équipement) gardés en mémoire
+ERROR_PLACEHOLDER_FONT_SIZE = 40
+# L'ancien rendu collait l'encadré d'équipement avec son propre masque : son alpha effectif était alpha²/255
+DEFAULT_AMENITY_BOX_ALPHA = IMAGE_OVERLAY_BG_COLOR[3] * IMAGE_OVERLAY_BG_COLOR[3] // 255
+DEFAULT_FOOTER_BAND_ALPHA = IMAGE_OVERLAY_BG_COLOR[3]
+
+# Contraste automatique : voile et couleur du texte choisis d'après la luminance de la photo sous le texte
+AUTO_CONTRAST_TARGET_RATIO = 4.5 # Ratio de contraste visé (WCAG AA)
+AUTO_CONTRAST_SAMPLE_STEP = 8 # Analyse sur 1 pixel sur 8 dans chaque direction
+OVERLAY_ALPHA_MIN = 64 # Le bandeau et l'encadré restent visibles, même sur une photo sombre
+OVERLAY_ALPHA_MAX = 224 # Plafond pour une couleur de texte trop sombre pour le ratio visé (le blanc demande au plus 144)
+OVERLAY_ALPHA_STEP = 16 # Alpha arrondi au palier supérieur : les calques en cache restent partagés
+BRAND_TEXT_MAX_ALPHA = 144 # Au-delà (fond clair, luminance > ~205), le texte d'équipement passe du jaune au blanc
+CONTRAST_CACHE_BYTES = 1024 * 1024 # Choix mémorisés par (image source, zone)
+TEXT_METRICS_CACHE_SIZE = 4096 # Nombre de (texte, police) dont les dimensions sont mémorisées
+
+# Téléchargement des images sources : session HTTP partagée (keep-alive + pool de connexions)
+MAX_IMAGE_SLIDES = 5
+DOWNLOAD_TIMEOUT = 20 # Timeout max (s) d'un téléchargement individuel
+CAROUSEL_DOWNLOAD_DEADLINE = float(os.environ.get("CAROUSEL_DOWNLOAD_DEADLINE", 30)) # Budget total (s) pour toutes les images d'un carrousel
+DOWNLOAD_MAX_WORKERS = 16 # Threads de téléchargement partagés par toutes les requêtes
+DOWNLOAD_MAX_PER_HOST = 4 # Téléchargements simultanés max vers un même hôte
+DOWNLOAD_POOL_HOSTS = 10 # Nombre d'hôtes gardés dans le pool de connexions
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Cache des images sources : LRU mémoire (images déjà recadrées en 1080x1080) + stockage disque (octets bruts)
+SOURCE_CACHE_DIR = os.path.join(VERCEL_TMP_DIR, "source_images_cache")
+SOURCE_CACHE_MEMORY_BUDGET = int(os.environ.get("SOURCE_CACHE_MEMORY_BUDGET", 150 * 1024 * 1024)) # octets
+SOURCE_CACHE_DISK_BUDGET = int(os.environ.get("SOURCE_CACHE_DISK_BUDGET", 300 * 1024 * 1024)) # octets
+SOURCE_CACHE_FRESH_SECONDS = int(os.environ.get("SOURCE_CACHE_FRESH_SECONDS", 3600)) # Au-delà : revalidation ETag/Last-Modified
+SOURCE_INDEX_MAX_ENTRIES = 4096 # URL -> empreinte gardées en mémoire (succès du cache mémoire sans lecture disque)
+
+# Cache de rendu : une slide déjà générée avec exactement les mêmes entrées n'est pas re-rendue
+RENDER_CACHE_DIR = os.path.join(VERCEL_TMP_DIR, "render_cache_temp")
+RENDER_LAYOUT_VERSION = "4" # À incrémenter à chaque modification du rendu des slides
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", 500 * 1024 * 1024)) # octets
+RENDER_CACHE_TTL_SECONDS = int(os.environ.get("RENDER_CACHE_TTL_SECONDS", 24 * 3600))
+RENDER_CACHE_SWEEP_INTERVAL = 60 # secondes minimum entre deux passes d'éviction
+
+# Encodage des slides (option "output" du payload)
+OUTPUT_FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+OUTPUT_FORMAT_MIMETYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+DEFAULT_OUTPUT_FORMAT = "PNG"
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_WEBP_QUALITY = 80
+DEFAULT_PNG_COMPRESS_LEVEL = 6 # Valeur par défaut de Pillow
+COVER_PALETTE_COLORS = 256 # La couverture (aplats de couleur) supporte une PNG en palette
+
+# Stockage des carrousels générés (OUTPUT_DIR) : budget, durée de vie et index en mémoire
+OUTPUT_STORE_MAX_BYTES = int(os.environ.get("OUTPUT_STORE_MAX_BYTES", 512 * 1024 * 1024)) # octets
+OUTPUT_STORE_TTL_SECONDS = int(os.environ.get("OUTPUT_STORE_TTL_SECONDS", 24 * 3600))
+OUTPUT_STORE_SWEEP_INTERVAL = 60 # secondes entre deux passes d'éviction en arrière-plan
+OUTPUT_STORE_MISS_RECHECK_SECONDS = 5 # Délai avant de revérifier sur disque un dossier inconnu de l'index
+GENERATED_IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable" # Les slides publiées ne changent jamais
+HOT_SLIDE_CACHE_BYTES = int(os.environ.get("HOT_SLIDE_CACHE_BYTES", 64 * 1024 * 1024)) # 0 : désactivé
+
+# Génération par lots (/api/generate/batch)
+BATCH_MAX_HOTELS = 1000
+BATCH_MAX_CONCURRENT_HOTELS = 8 # Hôtels en cours de traitement simultanément (téléchargement + rendu)
+BATCH_MAX_PENDING_HOTELS = BATCH_MAX_CONCURRENT_HOTELS * 2 # Hôtels soumis à l'exécuteur par lot (les suivants attendent)
+BATCH_RENDER_PROCESSES = max(1, min(4, os.cpu_count() or 1)) # Processus dédiés au rendu Pillow
+BATCH_RENDER_TIMEOUT_SECONDS = 120 # Au-delà, l'hôtel est signalé en erreur au lieu de bloquer sa ligne du lot
+
+# Mode asynchrone (/api/generate?mode=async) : état des jobs partagé entre workers via SQLite
+JOBS_DB_PATH = os.path.join(VERCEL_TMP_DIR, "carousel_jobs.sqlite3")
+JOB_MAX_WORKERS = 2
+JOB_RETENTION_SECONDS = 24 * 3600
+
+# Mesures du pipeline (/api/metrics, ?timings=1) et profilage d'une requête (?profile=1)
+STAGE_HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # secondes
+PROFILING_ENABLED = os.environ.get("CAROUSEL_PROFILING_ENABLED") == "1" # ?profile=1 refusé sinon
+PROFILE_DIR = os.path.join(VERCEL_TMP_DIR, "carousel_profiles")
+PROFILE_TOP_FUNCTIONS = 25
+
+# Démarrage à froid : l'import du module reste minimal, warm_up() fait le reste (à l'import si
+# CAROUSEL_WARM_UP_ON_IMPORT=1, sinon au premier appel de /api/warmup ou au premier rendu)
+WARM_UP_ON_IMPORT = os.environ.get("CAROUSEL_WARM_UP_ON_IMPORT") == "1"
+SUPPORTED_IMAGE_FORMATS = ("JPEG", "PNG", "WEBP", "GIF") # Plugins Pillow chargés d'avance (sorties et sources courantes)
 
 app = Flask(__name__)
 
-font_shrikhand_check = None
-font_bold_check = None
-font_regular_check = None
-try:
-    font_shrikhand_check = ImageFont.truetype(FONT_SHRIKHAND_PATH, 10)
-    font_bold_check = ImageFont.truetype(FONT_BOLD_PATH, 10)
-    font_regular_check = ImageFont.truetype(FONT_REGULAR_PATH, 10)
-    print("Polices principales chargées avec succès au démarrage de l'API.")
-except IOError as e:
-    print(f"ERREUR CRITIQUE AU DÉMARRAGE DE L'API: Impossible de charger une ou plusieurs polices depuis '{FONT_DIR}'. Erreur: {e}")
+# --- Registre des polices ---
+# Chaque couple (police, taille) est chargé une seule fois puis partagé entre requêtes et threads.
+FONT_PRELOAD_SPECS = {
+    FONT_SHRIKHAND_PATH: [SLIDE1_HOTEL_NAME_FONT_SIZE],
+    FONT_BOLD_PATH: [SLIDE1_RATING_TEXT_FONT_SIZE, IMAGE_SLIDE_EQUIPMENT_FONT_SIZE, IMAGE_SLIDE_FOOTER_HOTEL_NAME_SIZE, IMAGE_SLIDE_FOOTER_RATING_SIZE],
+    FONT_REGULAR_PATH: [PLACEHOLDER_FONT_SIZE, ERROR_PLACEHOLDER_FONT_SIZE],
+}
+
+_font_registry = {}
+_font_registry_lock = threading.Lock()
+
+def get_font(font_path, size):
+    """Police chargée depuis le registre (chargement unique par couple chemin/taille)."""
+    font = _font_registry.get((font_path, size))
+    if font is None:
+        with _font_registry_lock:
+            font = _font_registry.get((font_path, size))
+            if font is None:
+                font = ImageFont.truetype(font_path, size)
+                _font_registry[(font_path, size)] = font
+    return font
+
+def preload_fonts(font_path):
+    for size in FONT_PRELOAD_SPECS[font_path]:
+        get_font(font_path, size)
+    return True
+
+font_shrikhand_check = False
+font_bold_check = False
+font_regular_check = False
+_fonts_loaded = False
+_fonts_loading_lock = threading.Lock()
+
+def load_fonts():
+    """Charge les polices principales une seule fois (au warm-up ou au premier rendu)."""
+    global font_shrikhand_check, font_bold_check, font_regular_check, _fonts_loaded
+    if _fonts_loaded: return
+    with _fonts_loading_lock:
+        if _fonts_loaded: return
+        try:
+            font_shrikhand_check = preload_fonts(FONT_SHRIKHAND_PATH)
+            font_bold_check = preload_fonts(FONT_BOLD_PATH)
+            font_regular_check = preload_fonts(FONT_REGULAR_PATH)
+            print("Polices principales chargées avec succès au démarrage de l'API.")
+        except IOError as e:
+            print(f"ERREUR CRITIQUE AU DÉMARRAGE DE L'API: Impossible de charger une ou plusieurs polices depuis '{FONT_DIR}'. Erreur: {e}")
+        _fonts_loaded = True
+
+# --- Mesures du pipeline ---
+# Chaque étape du rendu alimente un histogramme global ; pendant le rendu d'une slide,
+# ses durées sont aussi cumulées pour cette slide (voir collect_slide_stages).
+
+class StageMetrics:
+    """Histogrammes de durée et compteurs d'octets par étape, exportés au format texte Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._durations = {} # étape -> [observations par seau (dernier : +Inf), somme, nombre]
+        self._bytes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        bucket_index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._durations.get(stage)
+            if series is None:
+                series = self._durations[stage] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bucket_index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def add_bytes(self, stage, amount):
+        with self._lock:
+            self._bytes[stage] = self._bytes.get(stage, 0) + amount
+
+    def render_prometheus(self):
+        with self._lock:
+            durations = {stage: list(series) for stage, series in self._durations.items()}
+            byte_counts = dict(self._bytes)
+        lines = ["# HELP carousel_stage_duration_seconds Durée de chaque étape du rendu des carrousels.",
+                 "# TYPE carousel_stage_duration_seconds histogram"]
+        for stage, series in sorted(durations.items()):
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'carousel_stage_duration_seconds_bucket{{stage="{stage}",le="{upper_bound}"}} {cumulative}')
+            lines.append(f'carousel_stage_duration_seconds_sum{{stage="{stage}"}} {series[-2]:.6f}')
+            lines.append(f'carousel_stage_duration_seconds_count{{stage="{stage}"}} {series[-1]}')
+        lines += ["# HELP carousel_stage_bytes_total Octets traités par étape (téléchargés, encodés).",
+                  "# TYPE carousel_stage_bytes_total counter"]
+        lines += [f'carousel_stage_bytes_total{{stage="{stage}"}} {amount}' for stage, amount in sorted(byte_counts.items())]
+        return lines
+
+stage_metrics = StageMetrics(STAGE_HISTOGRAM_BUCKETS)
+_stage_context = threading.local()
+
+@contextlib.contextmanager
+def measure_stage(stage):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        stage_metrics.observe(stage, elapsed)
+        slide_stages = getattr(_stage_context, "slide_stages", None)
+        if slide_stages is not None:
+            slide_stages[stage] = slide_stages.get(stage, 0.0) + elapsed * 1000
+
+def timed_stage(stage):
+    """Décorateur : chaque appel de la fonction est mesuré comme une étape `stage`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def collect_slide_stages():
+    """Cumule dans le dict produit ({étape: ms}) les étapes exécutées par ce thread pendant le bloc."""
+    previous_stages = getattr(_stage_context, "slide_stages", None)
+    slide_stages = _stage_context.slide_stages = {}
+    try:
+        yield slide_stages
+    finally:
+        _stage_context.slide_stages = previous_stages
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Exécute func sous cProfile (thread courant uniquement : les téléchargements en parallèle n'y figurent pas).
+    Retourne (résultat, {"path": fichier .prof dans PROFILE_DIR, "top": fonctions les plus coûteuses}).
+    """
+    import cProfile, pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_path = os.path.join(PROFILE_DIR, f"generate_{int(time.time())}_{uuid.uuid4().hex[:8]}.prof")
+    profiler.dump_stats(profile_path)
+    summary = StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return result, {"path": profile_path, "top": summary.getvalue()}
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_MAX_WORKERS, thread_name_prefix="carousel-download")
 
 # --- Fonctions Utilitaires (y compris le nouveau slugify) ---
 
@@ -83,20 +318,396 @@ def slugify_filename(value, allow_unicode=False, char_limit=50):
     return value[:char_limit]
 
 
-def download_image(url):
+def get_http_session():
+    """Session HTTP unique (keep-alive, pool de connexions) partagée entre requêtes et threads."""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests # Import différé : ~60 ms au démarrage à froid
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_HOSTS, pool_maxsize=DOWNLOAD_MAX_PER_HOST, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session = session
+    return _http_session
+
+def _get_host_semaphore(host):
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(DOWNLOAD_MAX_PER_HOST)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def _remaining_time(deadline):
+    if deadline is None: return None
+    return deadline - time.monotonic()
+
+@timed_stage("download")
+def http_get_image(url, deadline=None, headers=None):
+    """
+    Requête GET d'une image via la session partagée.
+    Respecte la limite de connexions par hôte et l'échéance `deadline` (time.monotonic()).
+    Retourne la réponse (contenu déjà lu dans response._content), ou None en cas d'échec.
+    """
+    import requests
+    semaphore = _get_host_semaphore(urlparse(url).netloc)
+    remaining = _remaining_time(deadline)
+    if remaining is not None and remaining <= 0:
+        print(f"  Avertissement: Échéance dépassée avant le téléchargement de {url}")
+        return None
+    if not semaphore.acquire(timeout=remaining):
+        print(f"  Avertissement: Échéance dépassée en attente d'une connexion pour {url}")
+        return None
     try:
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        img = Image.open(BytesIO(response.content))
-        return img.convert("RGBA")
+        remaining = _remaining_time(deadline)
+        timeout = DOWNLOAD_TIMEOUT if remaining is None else max(0.1, min(DOWNLOAD_TIMEOUT, remaining))
+        with get_http_session().get(url, timeout=timeout, stream=True, headers=headers) as response:
+            if response.status_code == 304:
+                response._content = b""
+                return response
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                chunks.append(chunk)
+                if deadline is not None and time.monotonic() > deadline:
+                    print(f"  Avertissement: Échéance dépassée pendant le téléchargement de {url}")
+                    return None
+            response._content = b"".join(chunks)
+            stage_metrics.add_bytes("download", len(response._content))
+            return response
     except requests.exceptions.RequestException as e:
         print(f"  Avertissement: Erreur téléchargement {url}: {e}")
-    except IOError:
-        print(f"  Avertissement: Erreur ouverture image {url}.")
     except Exception as e:
         print(f"  Avertissement: Erreur inconnue {url}: {e}")
+    finally:
+        semaphore.release()
     return None
 
+_image_plugins_registered = False
+
+def register_image_plugins():
+    """
+    Enregistre les plugins Pillow de SUPPORTED_IMAGE_FORMATS. Sans cela, ouvrir ou écrire un format hors
+    de Image.preinit() (WebP) déclenche Image.init(), qui importe la quarantaine de plugins. Une source
+    dans un autre format (TIFF...) reste décodée : Image.open() charge alors les plugins à la demande.
+    """
+    global _image_plugins_registered
+    if _image_plugins_registered: return
+    from PIL import GifImagePlugin, JpegImagePlugin, PngImagePlugin, WebPImagePlugin # noqa: F401
+    _image_plugins_registered = True
+
+@timed_stage("decode")
+def open_image_for_fit(image_bytes, target_size, source_label=""):
+    """
+    Décode une image source directement à la plus petite échelle qui couvre encore `target_size`
+    (mode draft JPEG, puis Image.reduce), pour éviter de décoder 4000+ px avant le recadrage.
+    Les images opaques restent en RGB ; seules celles avec transparence passent en RGBA.
+    """
+    register_image_plugins()
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        min_scale = max(target_size[0] / img.width, target_size[1] / img.height)
+        if min_scale < 1 and img.format == "JPEG":
+            # Le décodeur JPEG réduit par 1/2, 1/4 ou 1/8 en gardant une taille >= celle demandée
+            img.draft("RGB", (math.ceil(img.width * min_scale), math.ceil(img.height * min_scale)))
+        has_alpha = img.mode in ("RGBA", "RGBa", "LA", "La", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        reduce_factor = int(min(img.width / target_size[0], img.height / target_size[1]))
+        if reduce_factor >= 2:
+            img = img.reduce(reduce_factor)
+        return img
+    except IOError:
+        print(f"  Avertissement: Erreur ouverture image {source_label}.")
+    except Exception as e:
+        print(f"  Avertissement: Erreur inconnue {source_label}: {e}")
+    return None
+
+# --- Cache des images sources ---
+
+class ByteBudgetLRU:
+    """Cache LRU thread-safe borné par un budget en octets (taille estimée de chaque valeur)."""
+
+    def __init__(self, max_bytes, size_of):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.size_of(value)
+        if size > self.max_bytes: return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None: self.current_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def __contains__(self, key):
+        # Sans effet sur l'ordre LRU ni sur les compteurs
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.current_bytes, "maxBytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+def _image_size_in_bytes(img):
+    # Pillow stocke les images multi-bandes (RGB compris) sur 4 octets par pixel
+    return img.width * img.height * (1 if len(img.getbands()) == 1 else 4)
+
+# Image source téléchargée : `digest` (sha256 du contenu) sert de clé au cache mémoire des images recadrées,
+# `fetch_ms` est la durée de sa récupération (cache disque ou réseau). `data` vaut None quand l'image recadrée
+# était déjà en mémoire : le fichier n'a pas été relu (voir get_fitted_source_image).
+SourceImage = namedtuple("SourceImage", ["url", "data", "digest", "fetch_ms"], defaults=[None])
+
+fitted_image_cache = ByteBudgetLRU(SOURCE_CACHE_MEMORY_BUDGET, _image_size_in_bytes)
+_disk_cache_lock = threading.Lock()
+_disk_cache_bytes = None # Occupation du cache disque, calculée au premier accès
+disk_cache_counters = {"hits": 0, "misses": 0, "revalidated": 0, "refetched": 0, "writes": 0, "evictions": 0,
+                       "staleServed": 0, "rejected": 0}
+_source_index = OrderedDict() # URL -> (empreinte, date de validation), protégé par _disk_cache_lock
+
+def _count_disk_cache(counter):
+    with _disk_cache_lock:
+        disk_cache_counters[counter] += 1
+
+def _disk_cache_paths(url):
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base_path = os.path.join(SOURCE_CACHE_DIR, url_hash)
+    return base_path + ".img", base_path + ".json"
+
+def _read_disk_cache_entry(url):
+    data_path, meta_path = _disk_cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        with open(data_path, "rb") as data_file:
+            data = data_file.read()
+    except (OSError, ValueError):
+        return None, None
+    if meta.get("url") != url or hashlib.sha256(data).hexdigest() != meta.get("digest"):
+        return None, None
+    return meta, data
+
+def _write_disk_cache_meta(meta_path, meta):
+    tmp_meta_path = f"{meta_path}.{threading.get_ident()}.tmp"
+    with open(tmp_meta_path, "w", encoding="utf-8") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(tmp_meta_path, meta_path)
+
+def _scan_disk_cache():
+    """Retourne [(dernier accès, taille totale, chemin de base)] pour chaque entrée du cache disque."""
+    entries = []
+    try:
+        with os.scandir(SOURCE_CACHE_DIR) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".img"): continue
+                base_path = dir_entry.path[:-len(".img")]
+                try:
+                    data_stat = dir_entry.stat()
+                    meta_stat = os.stat(base_path + ".json")
+                except OSError:
+                    continue
+                entries.append((meta_stat.st_mtime, data_stat.st_size + meta_stat.st_size, base_path))
+    except FileNotFoundError:
+        pass
+    return entries
+
+def _evict_disk_cache_if_needed():
+    global _disk_cache_bytes
+    with _disk_cache_lock:
+        if _disk_cache_bytes is not None and _disk_cache_bytes <= SOURCE_CACHE_DISK_BUDGET: return
+        entries = _scan_disk_cache()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, base_path in sorted(entries):
+            if total_bytes <= SOURCE_CACHE_DISK_BUDGET: break
+            for path in (base_path + ".img", base_path + ".json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_bytes -= size
+            disk_cache_counters["evictions"] += 1
+        _disk_cache_bytes = total_bytes
+
+def _store_disk_cache_entry(url, response):
+    global _disk_cache_bytes
+    data = response.content
+    data_path, meta_path = _disk_cache_paths(url)
+    meta = {"url": url, "digest": hashlib.sha256(data).hexdigest(), "etag": response.headers.get("ETag"),
+            "lastModified": response.headers.get("Last-Modified"), "validatedAt": time.time()}
+    try:
+        os.makedirs(SOURCE_CACHE_DIR, exist_ok=True)
+        tmp_data_path = f"{data_path}.{threading.get_ident()}.tmp"
+        with open(tmp_data_path, "wb") as data_file:
+            data_file.write(data)
+        os.replace(tmp_data_path, data_path)
+        _write_disk_cache_meta(meta_path, meta)
+        with _disk_cache_lock:
+            disk_cache_counters["writes"] += 1
+            if _disk_cache_bytes is not None: _disk_cache_bytes += len(data)
+        _evict_disk_cache_if_needed()
+    except OSError as e:
+        print(f"  Avertissement: Impossible d'écrire {url} dans le cache disque: {e}")
+    return meta
+
+def _touch_disk_cache_entry(url):
+    try:
+        os.utime(_disk_cache_paths(url)[1]) # Marque l'entrée comme récemment utilisée pour l'éviction
+    except OSError:
+        pass
+
+def _index_source(url, digest, validated_at):
+    with _disk_cache_lock:
+        _source_index[url] = (digest, validated_at)
+        _source_index.move_to_end(url)
+        while len(_source_index) > SOURCE_INDEX_MAX_ENTRIES:
+            _source_index.popitem(last=False)
+
+def is_decodable_image(data, source_label=""):
+    """Vérifie (en-tête seulement, sans décoder les pixels) que les octets sont une image lisible par Pillow."""
+    register_image_plugins()
+    try:
+        Image.open(BytesIO(data))
+        return True
+    except Exception:
+        print(f"  Avertissement: Contenu reçu non reconnu comme image pour {source_label}")
+        return False
+
+def fetch_source_image(url, deadline=None):
+    """
+    Récupère une image source : cache mémoire (image déjà recadrée, sans lecture disque), puis cache disque.
+    Une entrée disque fraîche est servie sans réseau ; une entrée expirée est revalidée
+    (If-None-Match / If-Modified-Since), et reste servie si la revalidation échoue.
+    Seuls des octets reconnus comme image sont mis en cache. Retourne un SourceImage, ou None en cas d'échec.
+    """
+    started_at = time.perf_counter()
+    with _disk_cache_lock:
+        indexed = _source_index.get(url)
+    if indexed is not None and time.time() - indexed[1] < SOURCE_CACHE_FRESH_SECONDS and indexed[0] in fitted_image_cache:
+        _touch_disk_cache_entry(url) # Sans lecture, l'entrée disque d'une image très demandée paraîtrait la plus ancienne
+        return SourceImage(url, None, indexed[0], (time.perf_counter() - started_at) * 1000)
+
+    meta, data = _read_disk_cache_entry(url)
+    if meta is not None and time.time() - meta.get("validatedAt", 0) < SOURCE_CACHE_FRESH_SECONDS:
+        _count_disk_cache("hits")
+        _touch_disk_cache_entry(url)
+        _index_source(url, meta["digest"], meta["validatedAt"])
+        return SourceImage(url, data, meta["digest"], (time.perf_counter() - started_at) * 1000)
+
+    conditional_headers = {}
+    if meta is not None:
+        if meta.get("etag"): conditional_headers["If-None-Match"] = meta["etag"]
+        if meta.get("lastModified"): conditional_headers["If-Modified-Since"] = meta["lastModified"]
+    response = http_get_image(url, deadline, headers=conditional_headers or None)
+    revalidated = response is not None and response.status_code == 304 and meta is not None
+    if response is not None and not revalidated and not is_decodable_image(response.content, url):
+        _count_disk_cache("rejected")
+        response = None
+    if response is None:
+        if meta is None:
+            _count_disk_cache("misses")
+            return None
+        # Revalidation impossible : la copie expirée reste meilleure qu'une slide de remplacement
+        _count_disk_cache("staleServed")
+        print(f"  Avertissement: Revalidation impossible, copie en cache servie pour {url}")
+        return SourceImage(url, data, meta["digest"], (time.perf_counter() - started_at) * 1000)
+
+    if revalidated:
+        _count_disk_cache("revalidated")
+        meta["validatedAt"] = time.time()
+        try:
+            _write_disk_cache_meta(_disk_cache_paths(url)[1], meta)
+        except OSError as e:
+            print(f"  Avertissement: Impossible de mettre à jour le cache disque pour {url}: {e}")
+        _index_source(url, meta["digest"], meta["validatedAt"])
+        return SourceImage(url, data, meta["digest"], (time.perf_counter() - started_at) * 1000)
+
+    _count_disk_cache("refetched" if meta is not None else "misses")
+    meta = _store_disk_cache_entry(url, response)
+    _index_source(url, meta["digest"], meta["validatedAt"])
+    return SourceImage(url, response.content, meta["digest"], (time.perf_counter() - started_at) * 1000)
+
+def get_fitted_source_image(source_image):
+    """Image source recadrée en IMAGE_SIZE, depuis le cache mémoire si ce contenu a déjà été traité."""
+    fitted_img = fitted_image_cache.get(source_image.digest)
+    if fitted_img is not None: return fitted_img
+    if source_image.data is None:
+        # Image recadrée évincée depuis fetch_source_image (ou autre processus) : relecture du cache disque
+        meta, source_data = _read_disk_cache_entry(source_image.url)
+        if meta is None or meta["digest"] != source_image.digest:
+            # Entrée disque évincée elle aussi : nouvelle récupération, sans passer par l'index mémoire
+            with _disk_cache_lock:
+                _source_index.pop(source_image.url, None)
+            refetched_image = fetch_source_image(source_image.url)
+            if refetched_image is None: return None
+            if refetched_image.data is None: return fitted_image_cache.get(refetched_image.digest) # Recadrée entre-temps
+            source_image = refetched_image
+        else:
+            source_image = source_image._replace(data=source_data)
+    base_img = open_image_for_fit(source_image.data, IMAGE_SIZE, source_image.url)
+    if base_img is None: return None
+    fitted_img = resize_and_crop_to_square(base_img, IMAGE_SIZE)
+    fitted_image_cache.put(source_image.digest, fitted_img)
+    return fitted_img
+
+def get_source_cache_stats():
+    with _disk_cache_lock:
+        disk_stats = dict(disk_cache_counters)
+        disk_stats["bytes"] = _disk_cache_bytes
+        disk_stats["maxBytes"] = SOURCE_CACHE_DISK_BUDGET
+    return {"memory": fitted_image_cache.stats(), "disk": disk_stats}
+
+def start_image_prefetch(image_urls, deadline_seconds=CAROUSEL_DOWNLOAD_DEADLINE):
+    """
+    Lance en parallèle la récupération de toutes les images d'un carrousel.
+    Retourne (futures par URL, échéance) à passer à collect_prefetched_images.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    futures_by_url = {}
+    for url in image_urls:
+        if url and url not in futures_by_url:
+            futures_by_url[url] = download_executor.submit(fetch_source_image, url, deadline)
+    return futures_by_url, deadline
+
+def collect_prefetched_images(prefetch):
+    """Attend les téléchargements (au plus jusqu'à l'échéance) et retourne {url: SourceImage ou None}."""
+    futures_by_url, deadline = prefetch
+    if futures_by_url:
+        wait(list(futures_by_url.values()), timeout=max(0, _remaining_time(deadline)))
+    images_by_url = {}
+    for url, future in futures_by_url.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            images_by_url[url] = future.result()
+        else:
+            future.cancel()
+            print(f"  Avertissement: Image non reçue avant l'échéance : {url}")
+            images_by_url[url] = None
+    return images_by_url
+
+@timed_stage("fit")
 def resize_and_crop_to_square(img, target_size):
     try:
         return ImageOps.fit(img, target_size, Image.Resampling.LANCZOS, centering=(0.5, 0.5))
@@ -106,21 +717,27 @@ def resize_and_crop_to_square(img, target_size):
         draw = ImageDraw.Draw(placeholder)
         try:
             font_path_placeholder = FONT_REGULAR_PATH if font_regular_check else "arial.ttf"
-            font_placeholder_pil = ImageFont.truetype(font_path_placeholder, 40)
+            font_placeholder_pil = get_font(font_path_placeholder, ERROR_PLACEHOLDER_FONT_SIZE)
             text = "Erreur Image"
-            bbox = font_placeholder_pil.getbbox(text)
-            w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+            w, h = get_text_dimensions(text, font_placeholder_pil)
             draw.text(((target_size[0]-w)/2, (target_size[1]-h)/2), text, font=font_placeholder_pil, fill=(100,100,100), anchor="lt")
         except Exception as font_error:
             print(f"  Avertissement: Impossible de charger la police pour le placeholder: {font_error}")
         return placeholder
 
+@functools.lru_cache(maxsize=TEXT_METRICS_CACHE_SIZE)
+def get_text_bbox(text_string, font):
+    # Les polices venant du registre sont des instances uniques : leur identité suffit comme clé
+    return font.getbbox(text_string)
+
 def get_text_dimensions(text_string, font):
     if not text_string: return 0, 0
-    bbox = font.getbbox(text_string)
+    bbox = get_text_bbox(text_string, font)
     return bbox[2] - bbox[0], bbox[3] - bbox[1]
 
-def draw_multiline_text_custom_align(draw, text_lines, start_x_coord, start_y_coord, font, fill_color, line_spacing_val, align="left", container_width_val=None, max_total_height_val=None):
+@timed_stage("text_layout")
+def draw_multiline_text_custom_align(draw, text_lines, start_x_coord, start_y_coord, font, fill_color, line_spacing_val, align="left", container_width_val=None, max_total_height_val=None, origin=(0, 0)):
+    # origin : position sur la slide du calque dans lequel on dessine (les coordonnées restent celles de la slide)
     current_y = start_y_coord
     lines_drawn_height = 0
     valid_text_lines = [line for line in text_lines if line.strip()]
@@ -131,7 +748,7 @@ def draw_multiline_text_custom_align(draw, text_lines, start_x_coord, start_y_co
 
         if max_total_height_val and (lines_drawn_height + line_height > max_total_height_val):
             if i > 0:
-                prev_line_bbox = font.getbbox(valid_text_lines[i-1])
+                prev_line_bbox = get_text_bbox(valid_text_lines[i-1], font)
                 prev_line_height_actual = prev_line_bbox[3] - prev_line_bbox[1]
                 current_y -= (prev_line_height_actual + line_spacing_val)
                 
@@ -142,7 +759,7 @@ def draw_multiline_text_custom_align(draw, text_lines, start_x_coord, start_y_co
                 elif align == "right" and container_width_val:
                     final_x_ellipsis = container_width_val - PADDING - ellipsis_width
                 
-                draw.text((final_x_ellipsis, current_y), "...", font=font, fill=fill_color, anchor="la")
+                draw.text((final_x_ellipsis - origin[0], current_y - origin[1]), "...", font=font, fill=fill_color, anchor="la")
                 current_y += ellipsis_height 
             break
         
@@ -152,7 +769,7 @@ def draw_multiline_text_custom_align(draw, text_lines, start_x_coord, start_y_co
         elif align == "right" and container_width_val:
             actual_x_pos = container_width_val - PADDING - line_width
         
-        draw.text((actual_x_pos, current_y), line, font=font, fill=fill_color, anchor="la")
+        draw.text((actual_x_pos - origin[0], current_y - origin[1]), line, font=font, fill=fill_color, anchor="la")
         current_y += line_height + line_spacing_val
         
         lines_drawn_height += line_height
@@ -176,14 +793,16 @@ def draw_star(draw, x_center, y_center, size, fill_color):
 
 # --- Fonctions de création de slides ---
 
+@timed_stage("render")
 def create_first_slide(hotel_info):
+    load_fonts()
     if not font_shrikhand_check or not font_bold_check:
         raise RuntimeError("Polices principales non initialisées pour create_first_slide.")
 
     img = Image.new('RGB', IMAGE_SIZE, BACKGROUND_COLOR_SLIDE1)
     draw = ImageDraw.Draw(img)
-    font_hotel_name = ImageFont.truetype(FONT_SHRIKHAND_PATH, SLIDE1_HOTEL_NAME_FONT_SIZE)
-    font_rating_text = ImageFont.truetype(FONT_BOLD_PATH, SLIDE1_RATING_TEXT_FONT_SIZE)
+    font_hotel_name = get_font(FONT_SHRIKHAND_PATH, SLIDE1_HOTEL_NAME_FONT_SIZE)
+    font_rating_text = get_font(FONT_BOLD_PATH, SLIDE1_RATING_TEXT_FONT_SIZE)
     hotel_name = hotel_info.get('hotelName', 'Hôtel Inconnu')
     name_lines = textwrap.wrap(hotel_name, width=18) 
     total_name_text_height = 0
@@ -207,67 +826,617 @@ def create_first_slide(hotel_info):
     draw_star(draw, x_star_center, y_star_center, SLIDE1_STAR_SIZE, TEXT_COLOR_SLIDE1_RATING_TEXT)
     return img
 
-def create_amenity_image_slide(image_url, hotel_name, amenity_text, rating):
-    if not font_bold_check or not font_regular_check:
-        raise RuntimeError("Polices Bold ou Regular non initialisées pour create_amenity_image_slide.")
+# --- Calques des slides image ---
+# Le bandeau et l'encadré d'équipement sont rendus comme des calques RGBA recadrés au plus juste,
+# puis fusionnés uniquement sur leur zone de la photo : aucune image intermédiaire pleine taille.
 
-    base_img = download_image(image_url)
-    img_slide_base_rgba = Image.new('RGBA', IMAGE_SIZE, (220, 220, 220, 255)) 
-    if base_img:
-        if base_img.mode != 'RGBA': base_img = base_img.convert('RGBA')
-        cropped_img = resize_and_crop_to_square(base_img, IMAGE_SIZE)
-        img_slide_base_rgba.paste(cropped_img, (0,0))
-    else:
-        draw_placeholder = ImageDraw.Draw(img_slide_base_rgba)
-        # Utiliser une police système de base si les polices personnalisées échouent au démarrage
-        font_path_placeholder = FONT_REGULAR_PATH if font_regular_check else "arial.ttf" # Fallback vers arial
-        font_placeholder = ImageFont.truetype(font_path_placeholder, 50)
-        placeholder_text = "Image Indisponible"; w_placeholder, h_placeholder = get_text_dimensions(placeholder_text, font_placeholder)
-        draw_placeholder.text(((IMAGE_SIZE[0]-w_placeholder)/2, (IMAGE_SIZE[1]-h_placeholder)/2), placeholder_text, font=font_placeholder, fill=(100,100,100,255), anchor="lt")
-    
-    overlay = Image.new('RGBA', IMAGE_SIZE, (0,0,0,0)); draw_overlay = ImageDraw.Draw(overlay)
-    font_equipment = ImageFont.truetype(FONT_BOLD_PATH, IMAGE_SLIDE_EQUIPMENT_FONT_SIZE)
+def _union_box(box_a, box_b):
+    return (min(box_a[0], box_b[0]), min(box_a[1], box_b[1]), max(box_a[2], box_b[2]), max(box_a[3], box_b[3]))
+
+@functools.lru_cache(maxsize=LAYER_CACHE_SIZE)
+def get_amenity_text_layout(amenity_text):
+    """
+    Mise en page de l'encadré d'équipement, indépendante des couleurs. Retourne (lignes, y de départ,
+    encadré (x0, y0, x1, y1) ou None, zone entière du calque (x0, y0, x1, y1)), ou None si le texte est vide.
+    """
+    font_equipment = get_font(FONT_BOLD_PATH, IMAGE_SLIDE_EQUIPMENT_FONT_SIZE)
     equipment_lines = textwrap.wrap(amenity_text, width=16) 
     total_equipment_text_height = 0; max_equipment_line_width = 0
     for line in equipment_lines: w, line_h = get_text_dimensions(line, font_equipment); total_equipment_text_height += line_h + LINE_SPACING_TITLE; max_equipment_line_width = max(max_equipment_line_width, w)
     if equipment_lines: total_equipment_text_height -= LINE_SPACING_TITLE
     start_y_equipment = (IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT - total_equipment_text_height) / 2; start_y_equipment = max(IMAGE_SLIDE_TEXT_MARGIN, start_y_equipment)
-    
-    if equipment_lines:
-        equipment_bg_padding_x = 40; equipment_bg_padding_y = 25
-        bg_x0 = (IMAGE_SIZE[0] - max_equipment_line_width) / 2 - equipment_bg_padding_x; bg_y0 = start_y_equipment - equipment_bg_padding_y 
-        bg_x1 = bg_x0 + max_equipment_line_width + 2 * equipment_bg_padding_x; bg_y1 = start_y_equipment + total_equipment_text_height + equipment_bg_padding_y
-        bg_y1 = min(bg_y1, IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT - PADDING/4)
-        if bg_x1 > bg_x0 and bg_y1 > bg_y0:
-            temp_bg_img = Image.new('RGBA', IMAGE_SIZE, (0,0,0,0)); temp_draw = ImageDraw.Draw(temp_bg_img)
-            temp_draw.rounded_rectangle([(bg_x0, bg_y0), (bg_x1, bg_y1)], radius=30, fill=IMAGE_OVERLAY_BG_COLOR); overlay.paste(temp_bg_img, (0,0), temp_bg_img)
-    
-    draw_multiline_text_custom_align(draw_overlay, equipment_lines, 0, start_y_equipment, font_equipment, IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR, LINE_SPACING_TITLE, align="center", container_width_val=IMAGE_SIZE[0])
-    
-    footer_y_start = IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT; draw_overlay.rectangle([(0, footer_y_start), (IMAGE_SIZE[0], IMAGE_SIZE[1])], fill=IMAGE_OVERLAY_BG_COLOR)
-    font_footer_hotel_name = ImageFont.truetype(FONT_BOLD_PATH, IMAGE_SLIDE_FOOTER_HOTEL_NAME_SIZE)
-    font_footer_rating = ImageFont.truetype(FONT_BOLD_PATH, IMAGE_SLIDE_FOOTER_RATING_SIZE)
+    if not [line for line in equipment_lines if line.strip()]: return None
+
+    bg_x0 = (IMAGE_SIZE[0] - max_equipment_line_width) / 2 - AMENITY_BOX_PADDING_X; bg_y0 = start_y_equipment - AMENITY_BOX_PADDING_Y 
+    bg_x1 = bg_x0 + max_equipment_line_width + 2 * AMENITY_BOX_PADDING_X; bg_y1 = start_y_equipment + total_equipment_text_height + AMENITY_BOX_PADDING_Y
+    bg_y1 = min(bg_y1, IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT - PADDING/4)
+    has_background = bg_x1 > bg_x0 and bg_y1 > bg_y0
+
+    # Zone du calque : union de l'encadré et des boîtes englobantes réelles des lignes de texte
+    layer_box = (bg_x0, bg_y0, bg_x1 + 1, bg_y1 + 1) if has_background else (IMAGE_SIZE[0], IMAGE_SIZE[1], 0, 0)
+    line_y = start_y_equipment
+    for line in equipment_lines:
+        if not line.strip(): continue
+        line_width, line_height = get_text_dimensions(line, font_equipment)
+        line_x = (IMAGE_SIZE[0] - line_width) / 2
+        bbox = get_text_bbox(line, font_equipment)
+        layer_box = _union_box(layer_box, (line_x + bbox[0], line_y + bbox[1], line_x + bbox[2], line_y + bbox[3]))
+        line_y += line_height + LINE_SPACING_TITLE
+    x0, y0 = max(0, math.floor(layer_box[0]) - 1), max(0, math.floor(layer_box[1]) - 1)
+    x1, y1 = min(IMAGE_SIZE[0], math.ceil(layer_box[2]) + 1), min(IMAGE_SIZE[1], math.ceil(layer_box[3]) + 1)
+    return equipment_lines, start_y_equipment, (bg_x0, bg_y0, bg_x1, bg_y1) if has_background else None, (x0, y0, x1, y1)
+
+@functools.lru_cache(maxsize=LAYER_CACHE_SIZE)
+def get_amenity_text_layer(amenity_text, box_alpha=DEFAULT_AMENITY_BOX_ALPHA, text_color=IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR):
+    """
+    Calque de l'encadré d'équipement (fond arrondi + texte). Retourne (calque RGBA, position) ou None.
+    Partagé entre slides et carrousels : ne pas le modifier.
+    """
+    amenity_layout = get_amenity_text_layout(amenity_text)
+    if amenity_layout is None: return None
+    equipment_lines, start_y_equipment, background_box, (x0, y0, x1, y1) = amenity_layout
+    font_equipment = get_font(FONT_BOLD_PATH, IMAGE_SLIDE_EQUIPMENT_FONT_SIZE)
+
+    layer = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0)); draw_layer = ImageDraw.Draw(layer)
+    if background_box is not None:
+        bg_x0, bg_y0, bg_x1, bg_y1 = background_box
+        # Coordonnées arrondies dans le repère de la slide, comme Pillow le fait, avant décalage dans le calque
+        box_coords = [(round(bg_x0) - x0, round(bg_y0) - y0), (round(bg_x1) - x0, round(bg_y1) - y0)]
+        draw_layer.rounded_rectangle(box_coords, radius=AMENITY_BOX_RADIUS, fill=IMAGE_OVERLAY_BG_COLOR[:3] + (box_alpha,))
+    draw_multiline_text_custom_align(draw_layer, equipment_lines, 0, start_y_equipment, font_equipment, text_color, LINE_SPACING_TITLE, align="center", container_width_val=IMAGE_SIZE[0], origin=(x0, y0))
+    return layer, (x0, y0)
+
+@functools.lru_cache(maxsize=LAYER_CACHE_SIZE)
+def get_footer_layer(hotel_name, rating_text, band_alpha=DEFAULT_FOOTER_BAND_ALPHA, text_color=IMAGE_SLIDE_FOOTER_TEXT_COLOR):
+    """
+    Calque du bandeau bas (nom de l'hôtel, note, étoile), identique pour toutes les slides d'un carrousel.
+    Retourne (calque RGBA, position). Partagé entre slides : ne pas le modifier.
+    """
+    footer_y_start = IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT
+    layer = Image.new('RGBA', (IMAGE_SIZE[0], FOOTER_BAND_HEIGHT), IMAGE_OVERLAY_BG_COLOR[:3] + (band_alpha,)); draw_layer = ImageDraw.Draw(layer)
+    font_footer_hotel_name = get_font(FONT_BOLD_PATH, IMAGE_SLIDE_FOOTER_HOTEL_NAME_SIZE)
+    font_footer_rating = get_font(FONT_BOLD_PATH, IMAGE_SLIDE_FOOTER_RATING_SIZE)
     truncated_hotel_name_footer = textwrap.shorten(hotel_name, width=35, placeholder="..."); _, name_footer_height = get_text_dimensions(truncated_hotel_name_footer, font_footer_hotel_name)
-    y_hotel_name_footer = footer_y_start + (FOOTER_BAND_HEIGHT - name_footer_height) / 2
-    draw_overlay.text((FOOTER_PADDING, y_hotel_name_footer), truncated_hotel_name_footer, font=font_footer_hotel_name, fill=IMAGE_SLIDE_FOOTER_TEXT_COLOR, anchor="la")
+    y_hotel_name_footer = (FOOTER_BAND_HEIGHT - name_footer_height) / 2
+    draw_layer.text((FOOTER_PADDING, y_hotel_name_footer), truncated_hotel_name_footer, font=font_footer_hotel_name, fill=text_color, anchor="la")
     
-    if rating:
-        rating_footer_text = f"{rating}"; rating_text_width, rating_text_height = get_text_dimensions(rating_footer_text, font_footer_rating)
+    if rating_text:
+        rating_text_width, rating_text_height = get_text_dimensions(rating_text, font_footer_rating)
         x_rating_text_footer = IMAGE_SIZE[0] - FOOTER_PADDING - IMAGE_SLIDE_STAR_SIZE - STAR_TEXT_PADDING - rating_text_width
         combined_height_rating_star = max(rating_text_height, IMAGE_SLIDE_STAR_SIZE)
-        y_rating_elements_base = footer_y_start + (FOOTER_BAND_HEIGHT - combined_height_rating_star) / 2
+        y_rating_elements_base = (FOOTER_BAND_HEIGHT - combined_height_rating_star) / 2
         y_rating_text_final_footer = y_rating_elements_base + (combined_height_rating_star - rating_text_height) / 2
-        draw_overlay.text((x_rating_text_footer, y_rating_text_final_footer), rating_footer_text, font=font_footer_rating, fill=IMAGE_SLIDE_FOOTER_TEXT_COLOR, anchor="la")
+        draw_layer.text((x_rating_text_footer, y_rating_text_final_footer), rating_text, font=font_footer_rating, fill=text_color, anchor="la")
         x_star_footer_center = x_rating_text_footer + rating_text_width + STAR_TEXT_PADDING + (IMAGE_SLIDE_STAR_SIZE / 2)
         y_star_footer_center = y_rating_elements_base + combined_height_rating_star / 2
-        draw_star(draw_overlay, x_star_footer_center, y_star_footer_center, IMAGE_SLIDE_STAR_SIZE, IMAGE_SLIDE_FOOTER_TEXT_COLOR)
-    
-    img_slide_final = Image.alpha_composite(img_slide_base_rgba, overlay)
-    return img_slide_final.convert('RGB')
+        draw_star(draw_layer, x_star_footer_center, y_star_footer_center, IMAGE_SLIDE_STAR_SIZE, text_color)
+    return layer, (0, footer_y_start)
+
+@functools.lru_cache(maxsize=1)
+def get_placeholder_background():
+    """Fond « Image Indisponible » (RGB), rendu une seule fois. Ne pas le modifier : le copier."""
+    placeholder = Image.new('RGB', IMAGE_SIZE, PLACEHOLDER_BG_COLOR)
+    draw_placeholder = ImageDraw.Draw(placeholder)
+    # Utiliser une police système de base si les polices personnalisées échouent au démarrage
+    font_path_placeholder = FONT_REGULAR_PATH if font_regular_check else "arial.ttf" # Fallback vers arial
+    font_placeholder = get_font(font_path_placeholder, PLACEHOLDER_FONT_SIZE)
+    placeholder_text = "Image Indisponible"; w_placeholder, h_placeholder = get_text_dimensions(placeholder_text, font_placeholder)
+    draw_placeholder.text(((IMAGE_SIZE[0]-w_placeholder)/2, (IMAGE_SIZE[1]-h_placeholder)/2), placeholder_text, font=font_placeholder, fill=PLACEHOLDER_TEXT_COLOR, anchor="lt")
+    return placeholder
+
+@timed_stage("composite")
+def composite_layer(base_img, layer, position):
+    """Fusionne un calque RGBA sur la zone correspondante de la slide (en place)."""
+    if base_img.mode == 'RGBA':
+        base_img.alpha_composite(layer, dest=position)
+    else:
+        base_img.paste(layer, position, layer) # Fond opaque : le collage avec masque équivaut à alpha_composite
+
+# --- Contraste automatique ---
+# La luminance de la photo sous l'encadré et sous le bandeau fixe l'opacité du voile noir (et, pour
+# l'équipement, la couleur du texte) : juste assez de voile pour atteindre AUTO_CONTRAST_TARGET_RATIO.
+
+# Style d'une zone de texte : opacité du voile (0-255) et couleur du texte
+OverlayStyle = namedtuple("OverlayStyle", ["alpha", "text_color"])
+
+contrast_style_cache = ByteBudgetLRU(CONTRAST_CACHE_BYTES, lambda style: 64) # Taille estimée d'une entrée
+
+def _srgb_to_linear(channel_value):
+    channel = channel_value / 255
+    return channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+
+def _linear_to_srgb(linear_value):
+    channel = linear_value * 12.92 if linear_value <= 0.0031308 else 1.055 * linear_value ** (1 / 2.4) - 0.055
+    return channel * 255
+
+def relative_luminance(color):
+    red, green, blue = (_srgb_to_linear(channel) for channel in color[:3])
+    return 0.2126 * red + 0.7152 * green + 0.0722 * blue
+
+def measure_region_luminance(img, box):
+    """Luminance (0-255) de la zone `box` : (moyenne, écart-type), sur une grille de 1 pixel sur AUTO_CONTRAST_SAMPLE_STEP."""
+    sample_size = (max(1, (box[2] - box[0]) // AUTO_CONTRAST_SAMPLE_STEP), max(1, (box[3] - box[1]) // AUTO_CONTRAST_SAMPLE_STEP))
+    sample = img.resize(sample_size, Image.Resampling.NEAREST, box=box)
+    stat = ImageStat.Stat(sample.convert("L"))
+    return stat.mean[0], stat.stddev[0]
+
+def required_overlay_alpha(background_luma, text_color):
+    """Plus petite opacité du voile noir (0-255) qui donne AUTO_CONTRAST_TARGET_RATIO entre le texte et le fond voilé."""
+    max_background_luminance = (relative_luminance(text_color) + 0.05) / AUTO_CONTRAST_TARGET_RATIO - 0.05
+    if max_background_luminance <= 0: return 255
+    max_background_luma = _linear_to_srgb(max_background_luminance)
+    if background_luma <= max_background_luma: return 0
+    # Le voile est fusionné sur les valeurs sRGB : fond voilé = fond * (1 - alpha)
+    return math.ceil(255 * (1 - max_background_luma / background_luma))
+
+def choose_overlay_style(background_luma, text_colors):
+    """
+    Style pour un fond de luminance `background_luma`. La première couleur (couleur de marque) est gardée tant
+    que le voile nécessaire ne dépasse pas BRAND_TEXT_MAX_ALPHA ; sinon on prend celle qui demande le voile le plus léger.
+    """
+    candidates = []
+    for position, text_color in enumerate(text_colors):
+        alpha = required_overlay_alpha(background_luma, text_color)
+        alpha = min(OVERLAY_ALPHA_MAX, max(OVERLAY_ALPHA_MIN, math.ceil(alpha / OVERLAY_ALPHA_STEP) * OVERLAY_ALPHA_STEP))
+        if position == 0 and alpha <= BRAND_TEXT_MAX_ALPHA: return OverlayStyle(alpha, text_color)
+        candidates.append(OverlayStyle(alpha, text_color))
+    return min(candidates, key=lambda style: style.alpha)
+
+@timed_stage("contrast")
+def get_region_overlay_style(source_digest, fitted_img, box, text_colors):
+    """Style d'une zone de la photo, mémorisé par (image source, zone) : un nouveau rendu saute l'analyse."""
+    cache_key = (source_digest, box, text_colors)
+    style = contrast_style_cache.get(cache_key)
+    if style is None:
+        mean_luma, luma_stddev = measure_region_luminance(fitted_img, box)
+        # Le texte doit rester lisible sur les parties claires de la zone, pas seulement en moyenne
+        style = choose_overlay_style(min(255, mean_luma + luma_stddev), text_colors)
+        contrast_style_cache.put(cache_key, style)
+    return style
+
+_NOT_PREFETCHED = object()
+
+@timed_stage("render")
+def create_amenity_image_slide(image_url, hotel_name, amenity_text, rating, source_image=_NOT_PREFETCHED, cropped_img=_NOT_PREFETCHED):
+    load_fonts()
+    if not font_bold_check or not font_regular_check:
+        raise RuntimeError("Polices Bold ou Regular non initialisées pour create_amenity_image_slide.")
+
+    # source_image : SourceImage déjà récupéré par start_image_prefetch (None si le téléchargement a échoué)
+    if source_image is _NOT_PREFETCHED:
+        source_image = fetch_source_image(image_url)
+    # cropped_img : image recadrée déjà obtenue par l'appelant (None : fond de remplacement)
+    if cropped_img is _NOT_PREFETCHED:
+        cropped_img = get_fitted_source_image(source_image) if source_image else None
+    # Seule copie pleine taille de la slide : les images en cache ne doivent pas être modifiées
+    img_slide = cropped_img.copy() if cropped_img else get_placeholder_background().copy()
+
+    amenity_style = OverlayStyle(DEFAULT_AMENITY_BOX_ALPHA, IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR)
+    footer_style = OverlayStyle(DEFAULT_FOOTER_BAND_ALPHA, IMAGE_SLIDE_FOOTER_TEXT_COLOR)
+    amenity_layout = get_amenity_text_layout(amenity_text)
+    if cropped_img: # Le fond de remplacement garde le style par défaut
+        if amenity_layout:
+            amenity_style = get_region_overlay_style(source_image.digest, cropped_img, amenity_layout[3],
+                                                     (IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR, IMAGE_SLIDE_FOOTER_TEXT_COLOR))
+        footer_box = (0, IMAGE_SIZE[1] - FOOTER_BAND_HEIGHT, IMAGE_SIZE[0], IMAGE_SIZE[1])
+        footer_style = get_region_overlay_style(source_image.digest, cropped_img, footer_box, (IMAGE_SLIDE_FOOTER_TEXT_COLOR,))
+
+    amenity_layer = get_amenity_text_layer(amenity_text, *amenity_style) if amenity_layout else None
+    if amenity_layer: composite_layer(img_slide, *amenity_layer)
+    composite_layer(img_slide, *get_footer_layer(hotel_name, f"{rating}" if rating else "", *footer_style))
+    return img_slide if img_slide.mode == 'RGB' else img_slide.convert('RGB')
+
+# --- Encodage des slides ---
+
+OutputOptions = namedtuple("OutputOptions", ["format", "quality", "progressive", "lossless", "compress_level", "palette_cover"])
+
+def parse_output_options(output_payload):
+    """
+    Valide l'option "output" du payload, par ex. {"format": "jpeg", "quality": 85, "progressive": true},
+    {"format": "webp", "lossless": false} ou {"format": "png", "compressLevel": 3, "paletteCover": true}.
+    Lève ValueError si une valeur est invalide.
+    """
+    output_payload = output_payload or {}
+    if not isinstance(output_payload, dict):
+        raise ValueError("'output' doit être un objet")
+    output_format = str(output_payload.get("format", DEFAULT_OUTPUT_FORMAT)).upper()
+    if output_format == "JPG": output_format = "JPEG"
+    if output_format not in OUTPUT_FORMAT_EXTENSIONS:
+        raise ValueError(f"Format de sortie non supporté : {output_payload.get('format')}")
+    quality = output_payload.get("quality", DEFAULT_WEBP_QUALITY if output_format == "WEBP" else DEFAULT_JPEG_QUALITY)
+    compress_level = output_payload.get("compressLevel", DEFAULT_PNG_COMPRESS_LEVEL)
+    if not isinstance(quality, int) or not 1 <= quality <= 100:
+        raise ValueError("'quality' doit être un entier entre 1 et 100")
+    if not isinstance(compress_level, int) or not 0 <= compress_level <= 9:
+        raise ValueError("'compressLevel' doit être un entier entre 0 et 9")
+    return OutputOptions(
+        format=output_format,
+        quality=quality,
+        progressive=bool(output_payload.get("progressive", True)),
+        lossless=bool(output_payload.get("lossless", False)),
+        compress_level=compress_level,
+        palette_cover=bool(output_payload.get("paletteCover", True)),
+    )
+
+@timed_stage("encode")
+def encode_slide(slide_img, output_options, is_cover=False):
+    """Encode une slide en mémoire. Retourne (octets, durée d'encodage en ms)."""
+    register_image_plugins()
+    started_at = time.perf_counter()
+    buffer = BytesIO()
+    if output_options.format == "JPEG":
+        slide_img.save(buffer, format="JPEG", quality=output_options.quality, progressive=output_options.progressive, optimize=True)
+    elif output_options.format == "WEBP":
+        slide_img.save(buffer, format="WEBP", quality=output_options.quality, lossless=output_options.lossless)
+    else:
+        if is_cover and output_options.palette_cover:
+            slide_img = slide_img.quantize(colors=COVER_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+        slide_img.save(buffer, format="PNG", compress_level=output_options.compress_level)
+    stage_metrics.add_bytes("encode", buffer.tell())
+    return buffer.getvalue(), (time.perf_counter() - started_at) * 1000
+
+def write_file_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as output_file:
+        output_file.write(data)
+    os.replace(tmp_path, path)
+
+# --- Cache de rendu des slides ---
+
+_render_cache_lock = threading.Lock()
+_render_cache_last_sweep = 0.0
+render_cache_counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+def _count_render_cache(counter, amount=1):
+    with _render_cache_lock:
+        render_cache_counters[counter] += amount
+
+def compute_slide_cache_key(slide_kind, *slide_inputs):
+    """Empreinte des entrées d'une slide (plus la version du rendu) : clé du cache de rendu."""
+    payload = json.dumps([RENDER_LAYOUT_VERSION, slide_kind] + [str(value) for value in slide_inputs], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_cached_slide_path(cache_key, extension):
+    """Chemin de la slide en cache, ou None si elle n'a jamais été rendue (ou a été évincée)."""
+    cache_path = os.path.join(RENDER_CACHE_DIR, f"{cache_key}.{extension}")
+    try:
+        os.utime(cache_path) # Rafraîchit la date d'accès utilisée par l'éviction
+    except OSError:
+        _count_render_cache("misses")
+        return None
+    _count_render_cache("hits")
+    return cache_path
+
+def store_slide_in_cache(cache_key, extension, encoded_slide):
+    os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(RENDER_CACHE_DIR, f"{cache_key}.{extension}")
+    write_file_atomic(cache_path, encoded_slide)
+    _count_render_cache("writes")
+    return cache_path
+
+def publish_slide_file(source_path, destination_path):
+    """Place une slide du cache dans le dossier du carrousel (lien physique, copie en repli)."""
+    tmp_path = f"{destination_path}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source_path, tmp_path)
+    except OSError:
+        shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, destination_path)
+
+def sweep_render_cache(force=False):
+    """Supprime les slides expirées (TTL), puis les moins récemment utilisées au-delà du budget."""
+    global _render_cache_last_sweep
+    now = time.time()
+    with _render_cache_lock:
+        if not force and now - _render_cache_last_sweep < RENDER_CACHE_SWEEP_INTERVAL: return
+        _render_cache_last_sweep = now
+    entries = []
+    try:
+        with os.scandir(RENDER_CACHE_DIR) as it:
+            for dir_entry in it:
+                try:
+                    entry_stat = dir_entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, dir_entry.path))
+    except FileNotFoundError:
+        return
+    total_bytes = sum(size for _, size, _ in entries)
+    evicted = 0
+    for mtime, size, path in sorted(entries):
+        if total_bytes <= RENDER_CACHE_MAX_BYTES and now - mtime < RENDER_CACHE_TTL_SECONDS: break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_bytes -= size
+        evicted += 1
+    if evicted: _count_render_cache("evictions", evicted)
+
+def get_render_cache_stats():
+    with _render_cache_lock:
+        stats = dict(render_cache_counters)
+    stats["maxBytes"] = RENDER_CACHE_MAX_BYTES
+    stats["ttlSeconds"] = RENDER_CACHE_TTL_SECONDS
+    return stats
+
+# --- Stockage des carrousels générés ---
+
+OutputFile = namedtuple("OutputFile", ["size", "mtime", "etag"])
+
+class OutputStore:
+    """
+    Index en mémoire des dossiers de carrousels (dossier -> fichiers : taille, date, ETag), borné par
+    un budget en octets et une durée de vie. Les dossiers sont évincés du moins récemment servi au plus
+    récent, par un thread de fond. Le service des images consulte l'index sans appel à stat ; un dossier
+    inconnu (écrit par un autre worker) est cherché sur disque au plus une fois par
+    OUTPUT_STORE_MISS_RECHECK_SECONDS.
+    """
+
+    def __init__(self, root_dir, max_bytes, ttl_seconds, sweep_interval):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.current_bytes = 0
+        self.evictions = 0
+        self._folders = OrderedDict() # dossier -> {"files": {nom: OutputFile}, "bytes": int, "createdAt": float}
+        self._recent_misses = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._owner_pid = os.getpid()
+        self._sweeper = None
+
+    def _read_folder_from_disk(self, folder):
+        files = {}
+        try:
+            with os.scandir(os.path.join(self.root_dir, folder)) as it:
+                for dir_entry in it:
+                    if dir_entry.name.endswith(".tmp") or not dir_entry.is_file(): continue
+                    entry_stat = dir_entry.stat()
+                    files[dir_entry.name] = OutputFile(entry_stat.st_size, entry_stat.st_mtime, None) # ETag calculé au premier service
+        except OSError:
+            return None
+        return files
+
+    def _add_folder_locked(self, folder, files, created_at):
+        previous = self._folders.pop(folder, None)
+        if previous is not None: self.current_bytes -= previous["bytes"]
+        folder_bytes = sum(stored_file.size for stored_file in files.values())
+        self._folders[folder] = {"files": files, "bytes": folder_bytes, "createdAt": created_at}
+        self.current_bytes += folder_bytes
+
+    def _ensure_loaded_locked(self):
+        # Au premier accès, l'index reprend les dossiers déjà présents (du plus ancien au plus récent)
+        if self._loaded: return
+        self._loaded = True
+        try:
+            with os.scandir(self.root_dir) as it:
+                folders = sorted((dir_entry.stat().st_mtime, dir_entry.name) for dir_entry in it if dir_entry.is_dir())
+        except OSError:
+            return
+        for created_at, folder in folders:
+            files = self._read_folder_from_disk(folder)
+            if files is not None: self._add_folder_locked(folder, files, created_at)
+
+    def release_ownership(self):
+        """Processus de rendu : l'index et l'éviction restent au processus qui sert les images."""
+        self._owner_pid = None
+
+    def register_carousel(self, folder, slide_reports):
+        """
+        Ajoute (ou remplace) un dossier dans l'index à partir des rapports de generate_and_save_carousel.
+        Sans effet dans un processus de rendu (le parent réenregistre le dossier) ; hors du processus
+        propriétaire, jamais d'éviction : une copie périmée de l'index supprimerait des dossiers encore servis.
+        """
+        if self._owner_pid is None: return
+        now = time.time()
+        files = {report["file"]: OutputFile(report["bytes"], now, report.get("etag")) for report in slide_reports}
+        with self._lock:
+            self._ensure_loaded_locked()
+            self._add_folder_locked(folder, files, now)
+            self._recent_misses.pop(folder, None)
+            over_budget = self.current_bytes > self.max_bytes
+        self._start_sweeper()
+        if over_budget and os.getpid() == self._owner_pid: self.evict()
+
+    def lookup(self, folder, filename, check_disk=False):
+        """
+        Entrée OutputFile du fichier, ou None s'il n'existe pas.
+        `check_disk` autorise la recherche sur disque d'un dossier inconnu : `folder` doit alors être déjà nettoyé.
+        """
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded_locked()
+            folder_entry = self._folders.get(folder)
+            if folder_entry is None:
+                if not check_disk: return None
+                last_check = self._recent_misses.get(folder)
+                if last_check is not None and now - last_check < OUTPUT_STORE_MISS_RECHECK_SECONDS: return None
+        if folder_entry is None:
+            files = self._read_folder_from_disk(folder)
+            with self._lock:
+                if files is None:
+                    self._recent_misses[folder] = now
+                    if len(self._recent_misses) > 1024: self._recent_misses.clear()
+                    return None
+                if folder not in self._folders: self._add_folder_locked(folder, files, now)
+                folder_entry = self._folders[folder]
+        with self._lock:
+            if folder in self._folders: self._folders.move_to_end(folder)
+            return folder_entry["files"].get(filename)
+
+    def set_etag(self, folder, filename, etag):
+        with self._lock:
+            folder_entry = self._folders.get(folder)
+            if folder_entry and filename in folder_entry["files"]:
+                folder_entry["files"][filename] = folder_entry["files"][filename]._replace(etag=etag)
+
+    def evict(self):
+        """Supprime les dossiers expirés, puis les moins récemment servis tant que le budget est dépassé."""
+        now = time.time()
+        to_remove = []
+        with self._lock:
+            self._ensure_loaded_locked()
+            for folder, folder_entry in list(self._folders.items()):
+                if now - folder_entry["createdAt"] >= self.ttl_seconds:
+                    to_remove.append(folder)
+            remaining_bytes = self.current_bytes - sum(self._folders[folder]["bytes"] for folder in to_remove)
+            for folder, folder_entry in self._folders.items(): # Ordre LRU : le moins récemment servi d'abord
+                if remaining_bytes <= self.max_bytes: break
+                if folder in to_remove: continue
+                to_remove.append(folder)
+                remaining_bytes -= folder_entry["bytes"]
+            for folder in to_remove:
+                self.current_bytes -= self._folders.pop(folder)["bytes"]
+            self.evictions += len(to_remove)
+        for folder in to_remove:
+            shutil.rmtree(os.path.join(self.root_dir, folder), ignore_errors=True)
+        if to_remove: print(f"Stockage des carrousels : {len(to_remove)} dossier(s) évincé(s)")
+        return len(to_remove)
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"Erreur lors de l'éviction des carrousels : {e}")
+
+    def _start_sweeper(self):
+        # Uniquement dans le processus propriétaire (pas dans les processus de rendu)
+        if self._sweeper is not None or os.getpid() != self._owner_pid: return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_forever, name="output-store-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def stats(self):
+        with self._lock:
+            self._ensure_loaded_locked()
+            return {"folders": len(self._folders), "files": sum(len(f["files"]) for f in self._folders.values()),
+                    "bytes": self.current_bytes, "maxBytes": self.max_bytes,
+                    "occupancy": round(self.current_bytes / self.max_bytes, 4) if self.max_bytes else None,
+                    "ttlSeconds": self.ttl_seconds, "evictions": self.evictions}
+
+output_store = OutputStore(OUTPUT_DIR, OUTPUT_STORE_MAX_BYTES, OUTPUT_STORE_TTL_SECONDS, OUTPUT_STORE_SWEEP_INTERVAL)
+# Octets encodés des slides les plus servies, indexés par ETag (contenu identique = une seule entrée)
+hot_slide_cache = ByteBudgetLRU(HOT_SLIDE_CACHE_BYTES, len)
+
+def compute_etag(data):
+    return hashlib.sha256(data).hexdigest()[:32]
 
 # --- Logique principale de génération de carrousel ---
 
-def generate_and_save_carousel(hotel_data):
+def plan_image_slides(hotel_data, output_options):
+    """
+    Décrit les slides image d'un carrousel : [(URL, équipement, clé de cache, chemin en cache ou None)].
+    """
+    extension = OUTPUT_FORMAT_EXTENSIONS[output_options.format]
+    image_urls = hotel_data.get('imageUrls', [])
+    amenities = hotel_data.get('popularAmenities', [])
+    rating_value = hotel_data.get('rating', '')
+    hotel_name_for_footer = hotel_data.get('hotelName', 'Hôtel')
+    image_slide_specs = []
+    for i in range(min(len(image_urls), MAX_IMAGE_SLIDES)):
+        image_url = image_urls[i]
+        amenity_for_slide = amenities[i % len(amenities)] if amenities else "Découvrez nos services"
+        cache_key = compute_slide_cache_key("amenity", image_url, hotel_name_for_footer, amenity_for_slide, rating_value, tuple(output_options))
+        image_slide_specs.append((image_url, amenity_for_slide, cache_key, get_cached_slide_path(cache_key, extension)))
+    return image_slide_specs
+
+def start_carousel_prefetch(image_slide_specs):
+    # Seules les images des slides absentes du cache sont téléchargées
+    return start_image_prefetch([url for url, _, _, cached_path in image_slide_specs if cached_path is None])
+
+# Slide produite par iter_carousel_slides : `data` contient la slide encodée, ou vaut None si elle
+# est reprise telle quelle du cache de rendu (`cache_path`). `cacheable` est faux pour les slides
+# de remplacement (image indisponible), qui ne doivent jamais être mises en cache.
+# `stages` ({étape: ms}) et `source_bytes` décrivent le rendu ; vides pour une slide reprise du cache.
+RenderedSlide = namedtuple("RenderedSlide", ["filename", "data", "cache_path", "cache_key", "cacheable", "encode_ms", "stages", "source_bytes"],
+                           defaults=[None, None])
+
+def iter_carousel_slides(hotel_data, prefetched_images=None, progress_callback=None, image_slide_specs=None):
+    """
+    Produit les slides d'un carrousel une par une (RenderedSlide), dans l'ordre, dès qu'elles sont prêtes.
+    N'écrit rien sur disque : l'appelant décide de stocker ou de diffuser chaque slide.
+    `prefetched_images` ({URL: SourceImage ou None}) évite de relancer les téléchargements
+    quand ils ont déjà été faits par l'appelant (génération par lots), avec `image_slide_specs`
+    (plan_image_slides) : les slides ne sont pas planifiées (ni comptées dans le cache de rendu) deux fois.
+    `progress_callback(slides_done, slides_total)` est appelé après chaque slide, même en échec.
+    """
+    hotel_name = hotel_data.get('hotelName', 'hotel_inconnu')
+    output_options = parse_output_options(hotel_data.get('output'))
+    extension = OUTPUT_FORMAT_EXTENSIONS[output_options.format]
+    rating_value = hotel_data.get('rating', '')
+    hotel_name_for_footer = hotel_data.get('hotelName', 'Hôtel')
+
+    cover_cache_key = compute_slide_cache_key("cover", hotel_data.get('hotelName', 'Hôtel Inconnu'), hotel_data.get('rating', 'N/A'), tuple(output_options))
+    if image_slide_specs is None: image_slide_specs = plan_image_slides(hotel_data, output_options)
+    slides_total = 1 + len(image_slide_specs)
+    report_progress = progress_callback or (lambda slides_done, slides_total: None)
+
+    # Les téléchargements démarrent avant la slide de couverture pour se chevaucher avec son rendu
+    prefetch = start_carousel_prefetch(image_slide_specs) if prefetched_images is None else None
+
+    cover_slide = None
+    try:
+        cover_filename = f"00_cover.{extension}"
+        cover_cached_path = get_cached_slide_path(cover_cache_key, extension)
+        if cover_cached_path is None:
+            with collect_slide_stages() as slide_stages:
+                encoded_cover, encode_ms = encode_slide(create_first_slide(hotel_data), output_options, is_cover=True)
+            cover_slide = RenderedSlide(cover_filename, encoded_cover, None, cover_cache_key, True, encode_ms, slide_stages)
+        else:
+            cover_slide = RenderedSlide(cover_filename, None, cover_cached_path, cover_cache_key, True, None)
+    except Exception as e:
+        print(f"  Erreur création slide titre pour {hotel_name}: {e}")
+        traceback.print_exc()
+    report_progress(1, slides_total)
+    if cover_slide is not None: yield cover_slide
+
+    if prefetch is not None: prefetched_images = collect_prefetched_images(prefetch)
+
+    for i, (image_url, amenity_for_slide, cache_key, cached_path) in enumerate(image_slide_specs):
+        img_filename = f"{i+1:02d}_image.{extension}"
+        image_slide = None
+        try:
+            # Plan fourni par l'appelant avant les téléchargements : la slide a pu être évincée depuis
+            if cached_path is not None and os.path.exists(cached_path):
+                image_slide = RenderedSlide(img_filename, None, cached_path, cache_key, True, None)
+            else:
+                with collect_slide_stages() as slide_stages:
+                    if image_url in prefetched_images:
+                        source_image = prefetched_images[image_url]
+                    else:
+                        source_image = fetch_source_image(image_url) # Slide évincée du cache entre-temps
+                    # Octets téléchargés mais indécodables : la slide utilise le fond de remplacement, à ne pas mettre en cache
+                    cropped_img = get_fitted_source_image(source_image) if source_image else None
+                    slide_img = create_amenity_image_slide(image_url, hotel_name_for_footer, amenity_for_slide, rating_value,
+                                                           source_image=source_image, cropped_img=cropped_img)
+                    encoded_slide, encode_ms = encode_slide(slide_img, output_options) if slide_img else (None, None)
+                if encoded_slide is not None:
+                    # Téléchargement fait en parallèle (préchargement) : sa durée est rattachée à la slide
+                    if source_image is not None and source_image.fetch_ms is not None: slide_stages["download"] = source_image.fetch_ms
+                    image_slide = RenderedSlide(img_filename, encoded_slide, None, cache_key, cropped_img is not None, encode_ms,
+                                                slide_stages, len(source_image.data) if source_image is not None and source_image.data is not None else None)
+        except Exception as e:
+            print(f"  Erreur création slide image {i+1} pour {hotel_name}: {e}")
+            traceback.print_exc()
+        report_progress(i + 2, slides_total)
+        if image_slide is not None: yield image_slide
+
+def read_rendered_slide(slide):
+    if slide.data is not None: return slide.data
+    with open(slide.cache_path, "rb") as slide_file:
+        return slide_file.read()
+
+def generate_and_save_carousel(hotel_data, prefetched_images=None, progress_callback=None, image_slide_specs=None):
+    """
+    Génère le carrousel dans un nouveau dossier de OUTPUT_DIR.
+    Retourne (nom du dossier, fichiers, rapport par slide : taille encodée et temps d'encodage).
+    Voir iter_carousel_slides pour `prefetched_images`, `progress_callback` et `image_slide_specs`.
+    """
     hotel_name = hotel_data.get('hotelName', 'hotel_inconnu')
     timestamp = int(time.time())
     
@@ -282,42 +1451,397 @@ def generate_and_save_carousel(hotel_data):
     print(f"  Création du dossier temporaire : {hotel_specific_output_dir}")
 
     generated_image_relative_paths = []
+    slide_reports = []
+    for slide in iter_carousel_slides(hotel_data, prefetched_images, progress_callback, image_slide_specs):
+        slide_path_absolute = os.path.join(hotel_specific_output_dir, slide.filename)
+        slide_stages = dict(slide.stages or {})
+        try:
+            with collect_slide_stages() as save_stages, measure_stage("save"):
+                if slide.data is None:
+                    publish_slide_file(slide.cache_path, slide_path_absolute)
+                    print(f"  Diapositive reprise du cache : {slide_path_absolute}")
+                elif slide.cacheable:
+                    publish_slide_file(store_slide_in_cache(slide.cache_key, slide.filename.rsplit('.', 1)[1], slide.data), slide_path_absolute)
+                    print(f"  Diapositive créée : {slide_path_absolute}")
+                else:
+                    # Slide de remplacement (image indisponible) : jamais mise en cache
+                    write_file_atomic(slide_path_absolute, slide.data)
+                    print(f"  Diapositive de remplacement créée : {slide_path_absolute}")
+            slide_stages.update(save_stages)
+        except Exception as e:
+            print(f"  Erreur écriture slide {slide.filename} pour {hotel_name}: {e}")
+            traceback.print_exc()
+            continue
+        slide_data = read_rendered_slide(slide)
+        generated_image_relative_paths.append(slide.filename)
+        slide_reports.append({
+            "file": slide.filename,
+            "bytes": len(slide_data),
+            "encodeMs": round(slide.encode_ms, 2) if slide.encode_ms is not None else None,
+            "cached": slide.data is None,
+            "etag": compute_etag(slide_data),
+            "stagesMs": {stage: round(ms, 3) for stage, ms in slide_stages.items()},
+            "sourceBytes": slide.source_bytes,
+        })
+
+    output_store.register_carousel(unique_folder_name, slide_reports)
+    sweep_render_cache()
+    return unique_folder_name, generated_image_relative_paths, slide_reports
+
+# --- Diffusion directe des slides (ZIP / multipart) ---
+
+class _StreamBuffer:
+    """Flux en écriture seule (non positionnable) : zipfile y écrit, le générateur HTTP le vide."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_carousel_zip(hotel_data):
+    """Archive ZIP du carrousel, produite au fil du rendu (chaque slide est envoyée dès qu'elle est prête)."""
+    import zipfile
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive: # Images déjà compressées
+        for slide in iter_carousel_slides(hotel_data):
+            slide_info = zipfile.ZipInfo(slide.filename, date_time=time.localtime()[:6])
+            archive.writestr(slide_info, read_rendered_slide(slide))
+            yield buffer.drain()
+    yield buffer.drain() # Répertoire central, écrit à la fermeture
+
+def iter_carousel_multipart(hotel_data, boundary):
+    """Corps multipart/mixed du carrousel : une partie par slide, envoyée dès qu'elle est prête."""
+    mimetype = OUTPUT_FORMAT_MIMETYPES[parse_output_options(hotel_data.get('output')).format]
+    for slide in iter_carousel_slides(hotel_data):
+        slide_data = read_rendered_slide(slide)
+        part_headers = [
+            f"--{boundary}",
+            f"Content-Type: {mimetype}",
+            f'Content-Disposition: attachment; filename="{slide.filename}"',
+            f"Content-Length: {len(slide_data)}",
+        ]
+        if slide.encode_ms is not None: part_headers.append(f"X-Encode-Ms: {slide.encode_ms:.2f}")
+        yield ("\r\n".join(part_headers) + "\r\n\r\n").encode("ascii") + slide_data + b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+def pop_slide_timings(slide_reports):
+    """
+    Retire des rapports par slide les mesures détaillées (stagesMs, sourceBytes) et les regroupe :
+    {"stagesMs": cumul par étape, "slides": [détail par slide]}. Sert au champ optionnel `timings`.
+    """
+    stages_total = {}
+    slides = []
+    for report in slide_reports:
+        slide_stages = report.pop("stagesMs", None) or {}
+        slides.append({"file": report["file"], "cached": report["cached"], "stagesMs": slide_stages,
+                       "sourceBytes": report.pop("sourceBytes", None), "encodedBytes": report["bytes"]})
+        for stage, ms in slide_stages.items():
+            stages_total[stage] = round(stages_total.get(stage, 0) + ms, 3)
+    return {"stagesMs": stages_total, "slides": slides}
+
+def build_carousel_public_urls(base_public_url, unique_subfolder_name, relative_image_paths):
+    return [
+        f"{base_public_url}/generated_images/{unique_subfolder_name}/{os.path.basename(p)}" 
+        for p in relative_image_paths
+    ]
+
+# --- Génération par lots ---
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENT_HOTELS, thread_name_prefix="carousel-batch")
+_render_process_pool = None
+_render_process_pool_lock = threading.Lock()
+_render_process_pool_unavailable = False
+
+def _init_render_worker():
+    output_store.release_ownership()
+
+def get_render_process_pool():
+    """
+    Pool de processus pour le rendu Pillow (CPU). Retourne None si la plateforme ne permet pas
+    le multiprocessing (ex. pas de /dev/shm sur AWS Lambda) : le rendu se fait alors dans le thread appelant.
+    Les processus partent de forkserver (ou spawn), jamais d'un fork de ce processus : un verrou tenu
+    par un autre thread au moment du fork (métriques, caches, stdout) resterait pris pour toujours.
+    """
+    global _render_process_pool, _render_process_pool_unavailable
+    if _render_process_pool is None and not _render_process_pool_unavailable:
+        with _render_process_pool_lock:
+            if _render_process_pool is None and not _render_process_pool_unavailable:
+                try:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    _render_process_pool = ProcessPoolExecutor(max_workers=BATCH_RENDER_PROCESSES,
+                                                               mp_context=multiprocessing.get_context(start_method),
+                                                               initializer=_init_render_worker)
+                except (OSError, NotImplementedError, ImportError) as e:
+                    print(f"Avertissement: Pool de processus indisponible, rendu dans les threads : {e}")
+                    _render_process_pool_unavailable = True
+    return _render_process_pool
+
+def _reset_render_process_pool(broken_pool):
+    global _render_process_pool
+    with _render_process_pool_lock:
+        if _render_process_pool is broken_pool: _render_process_pool = None
+
+def render_carousel_in_pool(hotel_data, prefetched_images, image_slide_specs):
+    from concurrent.futures.process import BrokenProcessPool
+    render_pool = get_render_process_pool()
+    if render_pool is None:
+        return generate_and_save_carousel(hotel_data, prefetched_images, None, image_slide_specs)
+    render_future = render_pool.submit(generate_and_save_carousel, hotel_data, prefetched_images, None, image_slide_specs)
     try:
-        first_slide = create_first_slide(hotel_data)
-        cover_filename = "00_cover.png"
-        cover_path_absolute = os.path.join(hotel_specific_output_dir, cover_filename)
-        first_slide.save(cover_path_absolute)
-        generated_image_relative_paths.append(cover_filename)
-        print(f"  Diapositive de couverture créée : {cover_path_absolute}")
+        return render_future.result(timeout=BATCH_RENDER_TIMEOUT_SECONDS)
+    except TimeoutError:
+        render_future.cancel()
+        raise RuntimeError(f"Rendu non terminé après {BATCH_RENDER_TIMEOUT_SECONDS} s")
+    except BrokenProcessPool:
+        _reset_render_process_pool(render_pool)
+        raise
+
+def generate_batch_item(position, hotel_data, base_public_url):
+    """Traite un hôtel d'un lot ; ne lève jamais d'exception (l'erreur est rapportée dans le résultat)."""
+    started_at = time.perf_counter()
+    if not hotel_data or not isinstance(hotel_data, dict):
+        return {"index": position, "status": "error", "error": "Invalid hotel object",
+                "timings": {"totalMs": round((time.perf_counter() - started_at) * 1000, 1)}}
+    hotel_name = hotel_data.get('hotelName', 'hotel_inconnu')
+    try:
+        output_options = parse_output_options(hotel_data.get('output'))
+        image_slide_specs = plan_image_slides(hotel_data, output_options)
+        prefetched_images = collect_prefetched_images(start_carousel_prefetch(image_slide_specs))
+        downloaded_at = time.perf_counter()
+        unique_subfolder_name, relative_image_paths, slide_reports = render_carousel_in_pool(hotel_data, prefetched_images, image_slide_specs)
+        output_store.register_carousel(unique_subfolder_name, slide_reports) # Index du processus qui sert les images
+        finished_at = time.perf_counter()
+        slide_timings = pop_slide_timings(slide_reports)
+        return {
+            "index": position,
+            "hotelName": hotel_name,
+            "carouselImageUrls": build_carousel_public_urls(base_public_url, unique_subfolder_name, relative_image_paths),
+            "status": "success",
+            "generatedFilesIn": f"/tmp/{OUTPUT_DIR_NAME}/{unique_subfolder_name}",
+            "slides": slide_reports,
+            "timings": {"downloadMs": round((downloaded_at - started_at) * 1000, 1),
+                        "renderMs": round((finished_at - downloaded_at) * 1000, 1),
+                        "totalMs": round((finished_at - started_at) * 1000, 1),
+                        "stagesMs": slide_timings["stagesMs"]},
+        }
     except Exception as e:
-        print(f"  Erreur création slide titre pour {hotel_name}: {e}")
+        print(f"  Erreur lors de la génération par lots pour {hotel_name}: {e}")
         traceback.print_exc()
+        return {"index": position, "hotelName": hotel_name, "status": "error", "error": str(e),
+                "timings": {"totalMs": round((time.perf_counter() - started_at) * 1000, 1)}}
 
-    image_urls = hotel_data.get('imageUrls', [])
-    amenities = hotel_data.get('popularAmenities', [])
-    rating_value = hotel_data.get('rating', '')
-    hotel_name_for_footer = hotel_data.get('hotelName', 'Hôtel')
-    num_image_slides = min(len(image_urls), 5)
+def parse_batch_payload(raw_body, is_json):
+    """
+    Accepte une liste JSON d'hôtels (ou {"hotels": [...]}) ou un corps NDJSON (un hôtel par ligne).
+    Une ligne NDJSON invalide devient un élément None, signalé en erreur sans interrompre le lot.
+    """
+    try:
+        text = raw_body.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if is_json:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return None
+        if isinstance(payload, dict): payload = payload.get("hotels")
+        return payload if isinstance(payload, list) else None
+    hotels = []
+    for line in text.splitlines():
+        if not line.strip(): continue
+        try:
+            hotels.append(json.loads(line))
+        except ValueError:
+            hotels.append(None)
+    return hotels
 
-    for i in range(num_image_slides):
-        image_url = image_urls[i]
-        amenity_for_slide = amenities[i % len(amenities)] if amenities else "Découvrez nos services"
+def iter_batch_results(hotels, base_public_url):
+    """
+    Soumet les hôtels par fenêtre glissante (BATCH_MAX_PENDING_HOTELS au plus) : un lot ne monopolise pas
+    batch_executor. Si le client se déconnecte, le générateur est fermé et les hôtels non démarrés sont annulés.
+    """
+    remaining_hotels = enumerate(hotels)
+    in_flight = set()
+    try:
+        while True:
+            for position, hotel_data in islice(remaining_hotels, BATCH_MAX_PENDING_HOTELS - len(in_flight)):
+                in_flight.add(batch_executor.submit(generate_batch_item, position, hotel_data, base_public_url))
+            if not in_flight: break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield json.dumps(future.result(), ensure_ascii=False) + "\n"
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+# --- Jobs asynchrones ---
+
+job_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix="carousel-job")
+_jobs_db_initialized = False
+
+@contextlib.contextmanager
+def get_jobs_db():
+    """Connexion SQLite (une par appel : les connexions ne sont pas partagées entre threads)."""
+    global _jobs_db_initialized
+    connection = sqlite3.connect(JOBS_DB_PATH, timeout=10)
+    connection.row_factory = sqlite3.Row
+    if not _jobs_db_initialized:
+        connection.execute("PRAGMA journal_mode=WAL") # Lectures concurrentes depuis plusieurs workers
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, hotel_name TEXT, status TEXT NOT NULL,"
+            " slides_done INTEGER NOT NULL DEFAULT 0, slides_total INTEGER,"
+            " result_json TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.commit()
+        _jobs_db_initialized = True
+    try:
+        with connection: # Commit (ou rollback en cas d'erreur)
+            yield connection
+    finally:
+        connection.close()
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with get_jobs_db() as connection:
+        connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+
+def create_job(hotel_name):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with get_jobs_db() as connection:
+        connection.execute("DELETE FROM jobs WHERE updated_at < ?", (now - JOB_RETENTION_SECONDS,))
+        connection.execute("INSERT INTO jobs (id, hotel_name, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                           (job_id, hotel_name, now, now))
+    return job_id
+
+def get_job(job_id):
+    with get_jobs_db() as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None: return None
+    job = {
+        "jobId": row["id"],
+        "hotelName": row["hotel_name"],
+        "status": row["status"],
+        "progress": {"slidesDone": row["slides_done"], "slidesTotal": row["slides_total"]},
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+    }
+    if row["result_json"]: job.update(json.loads(row["result_json"]))
+    if row["error"]: job["error"] = row["error"]
+    return job
+
+def run_carousel_job(job_id, hotel_data, base_public_url, include_timings=False):
+    hotel_name = hotel_data.get('hotelName', 'hotel_inconnu')
+    try:
+        started_at = time.perf_counter()
+        update_job(job_id, status="running")
+        unique_subfolder_name, relative_image_paths, slide_reports = generate_and_save_carousel(
+            hotel_data,
+            progress_callback=lambda slides_done, slides_total: update_job(job_id, slides_done=slides_done, slides_total=slides_total),
+        )
+        result = {
+            "carouselImageUrls": build_carousel_public_urls(base_public_url, unique_subfolder_name, relative_image_paths),
+            "generatedFilesIn": f"/tmp/{OUTPUT_DIR_NAME}/{unique_subfolder_name}",
+            "slides": slide_reports,
+        }
+        slide_timings = pop_slide_timings(slide_reports)
+        if include_timings:
+            result["timings"] = dict(slide_timings, totalMs=round((time.perf_counter() - started_at) * 1000, 1))
+        update_job(job_id, status="success", result_json=json.dumps(result))
+        print(f"  Job {job_id} terminé pour {hotel_name}")
+    except Exception as e:
+        print(f"Erreur majeure lors du job {job_id} pour {hotel_name}: {e}")
+        traceback.print_exc()
         try:
-            image_slide = create_amenity_image_slide(image_url, hotel_name_for_footer, amenity_for_slide, rating_value)
-            if image_slide:
-                img_filename = f"{i+1:02d}_image.png"
-                img_path_absolute = os.path.join(hotel_specific_output_dir, img_filename)
-                image_slide.save(img_path_absolute)
-                generated_image_relative_paths.append(img_filename)
-                print(f"  Diapositive image {i+1} créée : {img_path_absolute}")
-        except Exception as e:
-            print(f"  Erreur création slide image {i+1} pour {hotel_name}: {e}")
+            update_job(job_id, status="error", error=str(e))
+        except sqlite3.Error:
             traceback.print_exc()
-            
-    return unique_folder_name, generated_image_relative_paths
+
+# --- Démarrage à froid ---
+
+_warm_up_lock = threading.Lock()
+_warm_up_report = None
+
+def _render_dummy_slide():
+    """
+    Mini-slide : texte dans chaque police chargée, calque fusionné, encodage puis décodage dans chaque
+    format (initialise le rastériseur FreeType et les codecs). Hors mesures du pipeline.
+    """
+    dummy_slide = Image.new('RGB', (64, 64), BACKGROUND_COLOR_SLIDE1)
+    draw = ImageDraw.Draw(dummy_slide)
+    for font in list(_font_registry.values()):
+        draw.text((0, 0), "Aé9", font=font, fill=TEXT_COLOR_SLIDE1_HOTEL_NAME, anchor="la")
+    overlay = Image.new('RGBA', (32, 32), IMAGE_OVERLAY_BG_COLOR)
+    dummy_slide.paste(overlay, (16, 16), overlay)
+    for output_format in OUTPUT_FORMAT_EXTENSIONS:
+        buffer = BytesIO()
+        dummy_slide.save(buffer, format=output_format)
+        Image.open(BytesIO(buffer.getvalue()), formats=SUPPORTED_IMAGE_FORMATS).load()
+    dummy_slide.quantize(colors=COVER_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+
+def warm_up():
+    """
+    Prépare le processus pour son premier carrousel : polices, plugins Pillow, session HTTP, mini-slide.
+    Idempotent ; retourne la durée de chaque étape (celles du premier appel).
+    """
+    global _warm_up_report
+    with _warm_up_lock:
+        if _warm_up_report is not None: return dict(_warm_up_report, alreadyWarm=True)
+        steps_ms = {}
+        for step_name, step in (("fonts", load_fonts), ("imagePlugins", register_image_plugins),
+                                ("httpSession", get_http_session), ("dummySlide", _render_dummy_slide)):
+            started_at = time.perf_counter()
+            step()
+            steps_ms[step_name] = round((time.perf_counter() - started_at) * 1000, 2)
+        _warm_up_report = {"stepsMs": steps_ms, "totalMs": round(sum(steps_ms.values()), 2),
+                           "fontsLoaded": font_shrikhand_check and font_bold_check and font_regular_check}
+        print(f"Warm-up terminé en {_warm_up_report['totalMs']} ms")
+        return dict(_warm_up_report, alreadyWarm=False)
+
+if WARM_UP_ON_IMPORT: warm_up()
 
 # --- Routes Flask ---
 
+@app.route('/api/warmup', methods=['GET', 'POST'])
+def handle_warmup_request():
+    # Ping de préchauffage (ex. cron Vercel) : rend le premier vrai carrousel aussi rapide que les suivants
+    return jsonify(dict(warm_up(), status="warm")), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def handle_cache_stats_request():
+    return jsonify({"sourceImages": get_source_cache_stats(), "renderedSlides": get_render_cache_stats(),
+                    "outputStore": output_store.stats(), "hotSlides": hot_slide_cache.stats()}), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def handle_metrics_request():
+    lines = stage_metrics.render_prometheus()
+    cache_stats = {"source_memory": fitted_image_cache.stats(), "source_disk": get_source_cache_stats()["disk"],
+                   "rendered_slides": get_render_cache_stats(), "hot_slides": hot_slide_cache.stats()}
+    lines += ["# HELP carousel_cache_events_total Événements des caches (hits, misses, évictions...).",
+              "# TYPE carousel_cache_events_total counter"]
+    for cache_name, stats in cache_stats.items():
+        for event in ("hits", "misses", "revalidated", "refetched", "writes", "evictions", "staleServed", "rejected"):
+            if event in stats: lines.append(f'carousel_cache_events_total{{cache="{cache_name}",event="{event}"}} {stats[event]}')
+    output_stats = output_store.stats()
+    lines += ["# HELP carousel_output_store_bytes Octets occupés par les carrousels publiés.",
+              "# TYPE carousel_output_store_bytes gauge",
+              f"carousel_output_store_bytes {output_stats['bytes']}"]
+    return Response("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route('/api/generate', methods=['POST'])
 def handle_generate_carousel_request():
     if not request.is_json:
@@ -326,27 +1850,70 @@ def handle_generate_carousel_request():
     if not hotel_data or not isinstance(hotel_data, dict):
         return jsonify({"error": "Invalid JSON payload"}), 400
 
+    try:
+        parse_output_options(hotel_data.get('output'))
+    except ValueError as e:
+        return jsonify({"error": "Invalid output options", "details": str(e)}), 400
+
     hotel_name = hotel_data.get('hotelName', 'hotel_inconnu')
     print(f"\nRequête reçue pour générer un carrousel pour : {hotel_name}")
 
+    include_timings = request.args.get('timings') == '1'
+    profile_requested = request.args.get('profile') == '1'
+    if profile_requested and not PROFILING_ENABLED:
+        return jsonify({"error": "Profiling is disabled (set CAROUSEL_PROFILING_ENABLED=1)"}), 403
+
+    delivery = request.args.get('delivery')
+    if profile_requested and (delivery not in (None, 'urls') or request.args.get('mode') == 'async'):
+        return jsonify({"error": "profile=1 is only supported for synchronous URL delivery"}), 400
+    if delivery in ('zip', 'multipart'):
+        if request.args.get('mode') == 'async':
+            return jsonify({"error": "delivery=zip|multipart is not compatible with mode=async"}), 400
+        # Diffusion directe : rien n'est écrit dans OUTPUT_DIR, les octets partent dès la première slide
+        if delivery == 'zip':
+            archive_name = f"{slugify_filename(hotel_name, char_limit=40) or 'carousel'}.zip"
+            return Response(iter_carousel_zip(hotel_data), mimetype="application/zip",
+                            headers={"Content-Disposition": f'attachment; filename="{archive_name}"'})
+        boundary = uuid.uuid4().hex
+        return Response(iter_carousel_multipart(hotel_data, boundary), mimetype=f"multipart/mixed; boundary={boundary}")
+    if delivery not in (None, 'urls'):
+        return jsonify({"error": "Invalid delivery (expected urls, zip or multipart)"}), 400
+
     try:
         if not os.path.exists(OUTPUT_DIR):
             os.makedirs(OUTPUT_DIR, exist_ok=True)
             print(f"Dossier de sortie principal créé dans /tmp : {OUTPUT_DIR}")
 
-        unique_subfolder_name, relative_image_paths = generate_and_save_carousel(hotel_data)
+        if request.args.get('mode') == 'async':
+            # Mode asynchrone : réponse immédiate, la génération continue en arrière-plan
+            job_id = create_job(hotel_name)
+            base_public_url = request.host_url.rstrip('/')
+            job_executor.submit(run_carousel_job, job_id, hotel_data, base_public_url, include_timings)
+            print(f"  Job {job_id} créé pour {hotel_name}")
+            return jsonify({"jobId": job_id, "status": "queued", "statusUrl": f"{base_public_url}/api/jobs/{job_id}"}), 202
+
+        started_at = time.perf_counter()
+        profile_info = None
+        if profile_requested:
+            (unique_subfolder_name, relative_image_paths, slide_reports), profile_info = run_profiled(generate_and_save_carousel, hotel_data)
+        else:
+            unique_subfolder_name, relative_image_paths, slide_reports = generate_and_save_carousel(hotel_data)
+        slide_timings = pop_slide_timings(slide_reports)
         
         base_public_url = request.host_url.rstrip('/')
-        carousel_public_urls = [
-            f"{base_public_url}/generated_images/{unique_subfolder_name}/{os.path.basename(p)}" 
-            for p in relative_image_paths
-        ]
+        carousel_public_urls = build_carousel_public_urls(base_public_url, unique_subfolder_name, relative_image_paths)
         response_data = {
             "hotelName": hotel_name,
             "carouselImageUrls": carousel_public_urls,
             "status": "success",
-            "generatedFilesIn": f"/tmp/{OUTPUT_DIR_NAME}/{unique_subfolder_name}" # Chemin Vercel
+            "generatedFilesIn": f"/tmp/{OUTPUT_DIR_NAME}/{unique_subfolder_name}", # Chemin Vercel
+            "slides": slide_reports
         }
+        if include_timings:
+            response_data["timings"] = dict(slide_timings, totalMs=round((time.perf_counter() - started_at) * 1000, 1))
+        if profile_info is not None:
+            response_data["profile"] = profile_info
+            print(f"  Profil enregistré : {profile_info['path']}")
         print(f"  Carrousel généré pour {hotel_name}. URLs publiques: {carousel_public_urls}")
         return jsonify(response_data), 200
     except Exception as e:
@@ -354,40 +1921,93 @@ def handle_generate_carousel_request():
         traceback.print_exc()
         return jsonify({"error": "Erreur interne du serveur lors de la génération des images", "details": str(e)}), 500
 
+@app.route('/api/generate/batch', methods=['POST'])
+def handle_generate_batch_request():
+    hotels = parse_batch_payload(request.get_data(), request.is_json)
+    if hotels is None:
+        return jsonify({"error": "Request must be a JSON list of hotels or an NDJSON body"}), 400
+    if len(hotels) > BATCH_MAX_HOTELS:
+        return jsonify({"error": f"Batch too large (max {BATCH_MAX_HOTELS} hotels)"}), 400
+
+    print(f"\nRequête reçue pour générer un lot de {len(hotels)} carrousels")
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Chaque ligne NDJSON est envoyée dès que l'hôtel correspondant est terminé
+    return Response(iter_batch_results(hotels, request.host_url.rstrip('/')), mimetype="application/x-ndjson")
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def handle_job_status_request(job_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return jsonify({"error": "Identifiant de job invalide"}), 400
+    try:
+        job = get_job(job_id)
+    except sqlite3.Error as e:
+        print(f"Erreur lors de la lecture du job {job_id}: {e}")
+        return jsonify({"error": "Erreur serveur lors de la lecture du job"}), 500
+    if job is None:
+        return jsonify({"error": "Job non trouvé"}), 404
+    return jsonify(job), 200
+
 @app.route('/generated_images/<path:carousel_folder>/<path:filename>')
 def serve_generated_image(carousel_folder, filename):
-    # Nettoyage simple pour la sécurité, même si slugify devrait déjà aider
-    safe_carousel_folder = slugify_filename(carousel_folder, char_limit=100) # Re-slugify pour être sûr
-    # Pour filename, on s'attend à un format comme "00_cover.png" ou "01_image.png"
-    # On peut être plus strict si nécessaire.
-    safe_filename = "".join(c for c in filename if c.isalnum() or c in ['_', '-', '.'])
-
-    if carousel_folder != safe_carousel_folder:
-        # Le slugify peut modifier légèrement, donc cette vérification peut être trop stricte
-        # Si le slugify de la route est identique au slugify original, c'est bon.
-        # Le principal est que safe_carousel_folder soit bien formé.
-        print(f"Avertissement: Le chemin du dossier du carrousel a été normalisé de '{carousel_folder}' à '{safe_carousel_folder}'")
-
-    if filename != safe_filename:
-        print(f"Avertissement: Le nom de fichier a été normalisé de '{filename}' à '{safe_filename}'")
-        # Pourrait retourner 400 si le nom de fichier d'origine contenait des caractères manifestement dangereux
-        # return jsonify({"error": "Nom de fichier invalide"}), 400
-
-    directory_path = os.path.join(VERCEL_TMP_DIR, OUTPUT_DIR_NAME, safe_carousel_folder)
-    
-    # Vérification de sécurité pour éviter le path traversal
-    abs_output_dir_root = os.path.abspath(os.path.join(VERCEL_TMP_DIR, OUTPUT_DIR_NAME))
-    abs_requested_dir_path = os.path.abspath(directory_path)
+    # Chemin connu de l'index : il a été créé par nous, inutile de le normaliser
+    stored_file = output_store.lookup(carousel_folder, filename)
+    if stored_file is None:
+        # Nettoyage simple pour la sécurité, même si slugify devrait déjà aider
+        safe_carousel_folder = slugify_filename(carousel_folder, char_limit=100) # Re-slugify pour être sûr
+        # Pour filename, on s'attend à un format comme "00_cover.png" ou "01_image.png"
+        # On peut être plus strict si nécessaire.
+        safe_filename = "".join(c for c in filename if c.isalnum() or c in ['_', '-', '.'])
+
+        if carousel_folder != safe_carousel_folder:
+            # Le slugify peut modifier légèrement, donc cette vérification peut être trop stricte
+            # Si le slugify de la route est identique au slugify original, c'est bon.
+            # Le principal est que safe_carousel_folder soit bien formé.
+            print(f"Avertissement: Le chemin du dossier du carrousel a été normalisé de '{carousel_folder}' à '{safe_carousel_folder}'")
+
+        if filename != safe_filename:
+            print(f"Avertissement: Le nom de fichier a été normalisé de '{filename}' à '{safe_filename}'")
+            # Pourrait retourner 400 si le nom de fichier d'origine contenait des caractères manifestement dangereux
+            # return jsonify({"error": "Nom de fichier invalide"}), 400
+
+        directory_path = os.path.join(VERCEL_TMP_DIR, OUTPUT_DIR_NAME, safe_carousel_folder)
+        
+        # Vérification de sécurité pour éviter le path traversal
+        abs_output_dir_root = os.path.abspath(os.path.join(VERCEL_TMP_DIR, OUTPUT_DIR_NAME))
+        abs_requested_dir_path = os.path.abspath(directory_path)
+
+        if not abs_requested_dir_path.startswith(abs_output_dir_root):
+            print(f"Tentative d'accès non autorisé (path traversal) pour image: {abs_requested_dir_path} (base attendue: {abs_output_dir_root})")
+            return jsonify({"error": "Accès non autorisé - chemin invalide"}), 403
 
-    if not abs_requested_dir_path.startswith(abs_output_dir_root):
-        print(f"Tentative d'accès non autorisé (path traversal) pour image: {abs_requested_dir_path} (base attendue: {abs_output_dir_root})")
-        return jsonify({"error": "Accès non autorisé - chemin invalide"}), 403
+        carousel_folder, filename = safe_carousel_folder, safe_filename
+        stored_file = output_store.lookup(carousel_folder, filename, check_disk=True) if safe_carousel_folder and safe_filename else None
+        if stored_file is None:
+            print(f"Image non trouvée: {os.path.join(directory_path, safe_filename)}")
+            return jsonify({"error": "Image non trouvée"}), 404
 
-    print(f"Tentative de servir: {safe_filename} depuis {directory_path}")
+    directory_path = os.path.join(output_store.root_dir, carousel_folder)
     try:
-        return send_from_directory(directory_path, safe_filename)
+        etag = stored_file.etag
+        if etag is not None and request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": GENERATED_IMAGE_CACHE_CONTROL})
+        image_data = hot_slide_cache.get(etag) if etag is not None else None
+        if image_data is None:
+            with open(os.path.join(directory_path, filename), "rb") as image_file:
+                image_data = image_file.read()
+            if etag is None:
+                # Fichier repris du disque au démarrage : ETag calculé une fois puis gardé dans l'index
+                etag = compute_etag(image_data)
+                output_store.set_etag(carousel_folder, filename, etag)
+            hot_slide_cache.put(etag, image_data)
+        response = Response(image_data, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.set_etag(etag)
+        response.last_modified = stored_file.mtime
+        response.headers["Cache-Control"] = GENERATED_IMAGE_CACHE_CONTROL
+        # Gère If-None-Match / If-Modified-Since (304) et Range (206) sur les octets en mémoire
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(image_data))
     except FileNotFoundError:
-        print(f"Image non trouvée: {os.path.join(directory_path, safe_filename)}")
+        print(f"Image non trouvée: {os.path.join(directory_path, filename)}")
         return jsonify({"error": "Image non trouvée"}), 404
     except Exception as e:
         print(f"Erreur en servant l'image: {e}")
@@ -0,0 +1,156 @@
+# benchmarks/_common.py
+# Outils partagés par les scripts de benchmark (à lancer depuis la racine du projet).
+import contextlib
+import functools
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_logs_to_stderr():
+    """Redirige les print() de l'application vers stderr : stdout reste réservé au JSON des résultats."""
+    return contextlib.redirect_stdout(sys.stderr)
+
+
+def load_app_module():
+    """Importe api/index.py comme le ferait le serveur."""
+    if PROJECT_ROOT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT_DIR)
+    with app_logs_to_stderr():
+        import api.index as app_module
+    return app_module
+
+
+def time_call(fn, repeat, *args, **kwargs):
+    """Exécute fn `repeat` fois et retourne les durées en millisecondes."""
+    durations_ms = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        durations_ms.append((time.perf_counter() - start) * 1000)
+    return durations_ms
+
+
+def summarize(durations_ms):
+    ordered = sorted(durations_ms)
+    return {
+        "runs": len(ordered),
+        "meanMs": round(statistics.fmean(ordered), 3),
+        "medianMs": round(statistics.median(ordered), 3),
+        "p95Ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "minMs": round(ordered[0], 3),
+    }
+
+
+def make_photo_fixture(size, seed=0):
+    """Image RGB synthétique au contenu « photographique » (dégradés, formes floues, grain)."""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    img = Image.merge("RGB", (gradient, radial, noise.filter(ImageFilter.GaussianBlur(2))))
+    draw = ImageDraw.Draw(img)
+    for _ in range(30):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randrange(max(size) // 40, max(size) // 6)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.ellipse((x0, y0, x0 + radius, y0 + radius), fill=color)
+    img = img.filter(ImageFilter.GaussianBlur(max(size) / 800))
+    grain = Image.effect_noise(size, 12).convert("RGB")
+    return Image.blend(img, grain, 0.08)
+
+
+def write_image_fixture(path, size, kind, seed=0):
+    """Écrit une fixture photo : kind parmi JPEG, PNG, PNG_ALPHA (transparence) et WEBP."""
+    img = make_photo_fixture(size, seed=seed)
+    if kind == "JPEG":
+        img.save(path, format="JPEG", quality=90)
+    elif kind == "WEBP":
+        img.save(path, format="WEBP", quality=85)
+    else:
+        if kind == "PNG_ALPHA": img.putalpha(200)
+        img.save(path, format="PNG", compress_level=1)
+    return path
+
+
+def peak_rss_kib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _QuietFixtureHandler(SimpleHTTPRequestHandler):
+    latency_seconds = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.latency_seconds: time.sleep(self.latency_seconds)
+        return super().do_GET()
+
+
+def serve_directory(directory, latency_ms=0):
+    """
+    Serveur HTTP local (thread de fond) qui remplace les hébergeurs d'images : les téléchargements
+    passent réellement par http_get_image, sans Internet. `latency_ms` simule le temps de réponse.
+    Retourne (serveur, URL de base) ; appeler serveur.shutdown() en fin de mesure.
+    """
+    handler = type("FixtureHandler", (_QuietFixtureHandler,), {"latency_seconds": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+HOTEL_NAMES = {
+    "short": "Riad Anika",
+    "medium": "Hôtel Le Grand Paris Élysée",
+    "long": "Grand Hôtel International de la Plage et des Thermes Marins de Saint-Jean-de-Luz",
+}
+AMENITY_POOL = [
+    "Piscine intérieure chauffée", "Wifi gratuit", "Spa", "Petit-déjeuner inclus", "Parking privé gratuit",
+    "Salle de sport ouverte 24h/24", "Navette aéroport", "Vue sur la mer depuis toutes les chambres",
+    "Restaurant", "Climatisation",
+]
+
+
+def make_hotel_payloads(image_urls, amenity_counts=(0, 1, 3, 8), seed=0):
+    """Payloads /api/generate synthétiques : chaque longueur de nom croisée avec chaque nombre d'équipements."""
+    rng = random.Random(seed)
+    payloads = {}
+    for name_kind, hotel_name in HOTEL_NAMES.items():
+        for amenity_count in amenity_counts:
+            payloads[f"name_{name_kind}-amenities_{amenity_count}"] = {
+                "hotelName": hotel_name,
+                "rating": f"{rng.uniform(6, 10):.1f}",
+                "popularAmenities": rng.sample(AMENITY_POOL, amenity_count),
+                "imageUrls": [image_urls[(rng.randrange(len(image_urls)) + i) % len(image_urls)] for i in range(5)],
+            }
+    return payloads
+
+
+def isolate_app_storage(index, root_dir):
+    """
+    Redirige caches et dossier de sortie de l'application vers root_dir (vide) et vide les caches mémoire :
+    la génération suivante part « à froid », sans toucher aux dossiers /tmp du serveur.
+    """
+    index.SOURCE_CACHE_DIR = os.path.join(root_dir, "source_images_cache")
+    index.RENDER_CACHE_DIR = os.path.join(root_dir, "render_cache")
+    index.OUTPUT_DIR = os.path.join(root_dir, "output")
+    index._disk_cache_bytes = None
+    index._source_index.clear()
+    index.fitted_image_cache = index.ByteBudgetLRU(index.SOURCE_CACHE_MEMORY_BUDGET, index._image_size_in_bytes)
+    index.output_store = index.OutputStore(index.OUTPUT_DIR, index.OUTPUT_STORE_MAX_BYTES,
+                                           index.OUTPUT_STORE_TTL_SECONDS, index.OUTPUT_STORE_SWEEP_INTERVAL)
+    index.contrast_style_cache = index.ByteBudgetLRU(index.CONTRAST_CACHE_BYTES, lambda style: 64)
+    index.get_amenity_text_layout.cache_clear()
+    index.get_amenity_text_layer.cache_clear()
+    index.get_footer_layer.cache_clear()
@@ -0,0 +1,49 @@
+# benchmarks/bench_encoding.py
+# Taille et latence d'encodage des slides selon le format de sortie (option "output" du payload).
+#
+#   python benchmarks/bench_encoding.py [--repeat 5]
+import argparse
+import json
+
+from _common import app_logs_to_stderr, load_app_module, make_photo_fixture, summarize, time_call
+
+OUTPUT_VARIANTS = [
+    {"format": "png"},
+    {"format": "png", "compressLevel": 1},
+    {"format": "png", "compressLevel": 9},
+    {"format": "png", "paletteCover": False},
+    {"format": "jpeg", "quality": 85, "progressive": True},
+    {"format": "jpeg", "quality": 85, "progressive": False},
+    {"format": "jpeg", "quality": 70},
+    {"format": "webp", "quality": 80},
+    {"format": "webp", "lossless": True},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des formats de sortie des slides")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    index = load_app_module()
+    with app_logs_to_stderr():
+        cover_slide = index.create_first_slide({"hotelName": "Hôtel Le Grand Paris Élysée", "rating": "9.1"})
+        fitted_photo = make_photo_fixture(index.IMAGE_SIZE, seed=1).convert("RGBA")
+        source_image = index.SourceImage("fixture://photo", None, "bench-encoding-photo")
+        index.fitted_image_cache.put(source_image.digest, fitted_photo)
+        amenity_slide = index.create_amenity_image_slide(source_image.url, "Hôtel Le Grand Paris Élysée", "Piscine intérieure chauffée", "9.1", source_image=source_image)
+
+    results = []
+    for variant in OUTPUT_VARIANTS:
+        options = index.parse_output_options(variant)
+        row = {"output": variant}
+        for slide_name, slide_img, is_cover in (("cover", cover_slide, True), ("amenity", amenity_slide, False)):
+            encoded, _ = index.encode_slide(slide_img, options, is_cover=is_cover)
+            durations = time_call(index.encode_slide, args.repeat, slide_img, options, is_cover=is_cover)
+            row[slide_name] = {"bytes": len(encoded), "encode": summarize(durations)}
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# benchmarks/bench_pipeline.py
+# Suite de référence du pipeline de génération, à comparer entre deux commits (compare_results.py).
+# Fixtures générées localement (plusieurs tailles et formats) et servies par un serveur HTTP local :
+# les téléchargements passent réellement par http_get_image, sans Internet. Payloads synthétiques
+# (longueur du nom x nombre d'équipements). Mesures par fonction, de bout en bout (caches froids puis
+# chauds, détail par étape), débit en carrousels/s à N threads, et pic de mémoire (RSS) par section.
+# Chaque section tourne dans son propre sous-processus pour que son pic de RSS lui soit propre.
+#
+#   python benchmarks/bench_pipeline.py [--repeat 3] [--workers 1,2,4] [--carousels 8] [--latency-ms 0] [--output FILE]
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import (PROJECT_ROOT_DIR, app_logs_to_stderr, isolate_app_storage, load_app_module, make_hotel_payloads,
+                     peak_rss_kib, serve_directory, summarize, time_call, write_image_fixture)
+
+FIXTURES = [
+    ("jpeg_800x600", (800, 600), "JPEG"),
+    ("jpeg_1920x1280", (1920, 1280), "JPEG"),
+    ("jpeg_4000x3000", (4000, 3000), "JPEG"),
+    ("png_1200x1200", (1200, 1200), "PNG"),
+    ("png_alpha_1600x1000", (1600, 1000), "PNG_ALPHA"),
+    ("webp_2000x1500", (2000, 1500), "WEBP"),
+]
+FIXTURE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "PNG_ALPHA": "png", "WEBP": "webp"}
+
+
+def write_fixtures(directory):
+    files = {}
+    for name, size, kind in FIXTURES:
+        path = write_image_fixture(os.path.join(directory, f"{name}.{FIXTURE_EXTENSIONS[kind]}"), size, kind, seed=len(name))
+        files[name] = os.path.basename(path)
+    return files
+
+
+def fixture_urls(base_url, fixture_files):
+    return {name: f"{base_url}/{filename}" for name, filename in fixture_files.items()}
+
+
+def mean_stages(stage_runs):
+    """Moyenne par étape des cumuls {étape: ms} de plusieurs carrousels."""
+    totals = {}
+    for stages in stage_runs:
+        for stage, ms in stages.items():
+            totals[stage] = totals.get(stage, 0.0) + ms
+    return {stage: round(total / len(stage_runs), 3) for stage, total in sorted(totals.items())}
+
+
+def bench_functions(index, urls, payloads, repeat, work_dir):
+    """Fonctions du pipeline isolées : récupération + recadrage par fixture, puis rendu et encodage."""
+    results = {"fetchSourceImage": {}, "fitSourceImage": {}, "createFirstSlide": {}, "createAmenityImageSlide": {}, "encodeSlide": {}}
+    for name, url in urls.items():
+        fetch_durations, fit_durations = [], []
+        for run in range(repeat):
+            isolate_app_storage(index, os.path.join(work_dir, f"fetch_{name}_{run}"))
+            start = time.perf_counter()
+            source_image = index.fetch_source_image(url)
+            fetch_durations.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            index.get_fitted_source_image(source_image)
+            fit_durations.append((time.perf_counter() - start) * 1000)
+        results["fetchSourceImage"][name] = dict(summarize(fetch_durations), bytes=len(source_image.data))
+        results["fitSourceImage"][name] = summarize(fit_durations)
+
+    isolate_app_storage(index, os.path.join(work_dir, "render"))
+    source_image = index.fetch_source_image(urls["jpeg_1920x1280"])
+    index.get_fitted_source_image(source_image)
+    output_options = index.parse_output_options(None)
+    for payload_name, payload in payloads.items():
+        if payload_name.endswith("amenities_1"):
+            results["createFirstSlide"][payload_name] = summarize(time_call(index.create_first_slide, repeat, payload))
+        amenity_text = payload["popularAmenities"][-1] if payload["popularAmenities"] else "Découvrez nos services"
+
+        def render_amenity_slide():
+            # Calques vidés à chaque appel : on mesure leur rendu, pas seulement la fusion
+            index.get_amenity_text_layer.cache_clear()
+            index.get_footer_layer.cache_clear()
+            return index.create_amenity_image_slide(source_image.url, payload["hotelName"], amenity_text, payload["rating"], source_image=source_image)
+        results["createAmenityImageSlide"][payload_name] = summarize(time_call(render_amenity_slide, repeat))
+
+    payload = payloads["name_medium-amenities_3"]
+    cover_slide = index.create_first_slide(payload)
+    amenity_slide = index.create_amenity_image_slide(source_image.url, payload["hotelName"], payload["popularAmenities"][0], payload["rating"], source_image=source_image)
+    results["encodeSlide"]["cover"] = summarize(time_call(index.encode_slide, repeat, cover_slide, output_options, is_cover=True))
+    results["encodeSlide"]["amenity"] = summarize(time_call(index.encode_slide, repeat, amenity_slide, output_options))
+    return results
+
+
+def generate_carousel(index, payload):
+    """generate_and_save_carousel + détail par étape (stagesMs cumulés sur les slides)."""
+    start = time.perf_counter()
+    _, _, slide_reports = index.generate_and_save_carousel(payload)
+    duration_ms = (time.perf_counter() - start) * 1000
+    return duration_ms, index.pop_slide_timings(slide_reports)["stagesMs"]
+
+
+def bench_end_to_end(index, payloads, repeat, work_dir, warm):
+    """Carrousel complet par payload ; à froid, les caches sont vidés avant chaque génération."""
+    results = {}
+    for payload_name, payload in payloads.items():
+        if warm:
+            isolate_app_storage(index, os.path.join(work_dir, payload_name))
+            generate_carousel(index, payload) # Amorçage des caches
+        durations, stage_runs = [], []
+        for run in range(repeat):
+            if not warm: isolate_app_storage(index, os.path.join(work_dir, f"{payload_name}_{run}"))
+            duration_ms, stages = generate_carousel(index, payload)
+            durations.append(duration_ms)
+            stage_runs.append(stages)
+        results[payload_name] = dict(summarize(durations), stagesMs=mean_stages(stage_runs))
+    return results
+
+
+def bench_throughput(index, payloads, workers, carousels, work_dir):
+    """Carrousels/s avec `workers` générations simultanées (threads, comme le serveur), caches froids."""
+    isolate_app_storage(index, work_dir)
+    payload_list = list(payloads.values())
+    # Noms distincts : chaque carrousel a ses propres slides (pas de succès du cache de rendu entre eux)
+    jobs = [dict(payload_list[i % len(payload_list)], hotelName=f"{payload_list[i % len(payload_list)]['hotelName']} {i}")
+            for i in range(carousels)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        durations = [duration_ms for duration_ms, _ in executor.map(lambda payload: generate_carousel(index, payload), jobs)]
+    elapsed = time.perf_counter() - start
+    return {"workers": workers, "carousels": carousels, "elapsedS": round(elapsed, 3),
+            "carouselsPerSecond": round(carousels / elapsed, 3), "latency": summarize(durations)}
+
+
+def run_section(section, base_url, fixture_files, repeat, carousels):
+    index = load_app_module()
+    urls = fixture_urls(base_url, fixture_files)
+    payloads = make_hotel_payloads(list(urls.values()))
+    baseline_rss = peak_rss_kib()
+    with tempfile.TemporaryDirectory(prefix=f"bench_pipeline_{section}_") as work_dir, app_logs_to_stderr():
+        if section == "functions":
+            result = bench_functions(index, urls, payloads, repeat, work_dir)
+        elif section in ("endToEndCold", "endToEndWarm"):
+            result = bench_end_to_end(index, payloads, repeat, work_dir, warm=section == "endToEndWarm")
+        else:
+            result = bench_throughput(index, payloads, int(section.split("_")[1]), carousels, work_dir)
+    result = {"result": result, "memory": {"importRssMiB": round(baseline_rss / 1024, 1),
+                                           "peakRssMiB": round(peak_rss_kib() / 1024, 1),
+                                           "peakRssDeltaMiB": round((peak_rss_kib() - baseline_rss) / 1024, 1)}}
+    print(json.dumps(result))
+
+
+def run_in_subprocess(*args):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), *args], check=True, capture_output=True, text=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def describe_environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    pillow_version = subprocess.run([sys.executable, "-c", "import PIL; print(PIL.__version__)"], capture_output=True, text=True).stdout.strip()
+    return {"commit": commit, "python": platform.python_version(), "pillow": pillow_version,
+            "platform": platform.platform(), "cpuCount": os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de benchmark du pipeline de génération des carrousels")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", default="1,2,4", help="Nombres de générations simultanées pour le débit")
+    parser.add_argument("--carousels", type=int, default=8, help="Carrousels générés par mesure de débit")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Latence simulée du serveur d'images")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout)")
+    parser.add_argument("--write-fixtures", metavar="DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--section", nargs=3, metavar=("NAME", "BASE_URL", "FIXTURES_JSON"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.write_fixtures:
+        return print(json.dumps(write_fixtures(args.write_fixtures)))
+    if args.section:
+        section, base_url, fixture_files = args.section
+        return run_section(section, base_url, json.loads(fixture_files), args.repeat, args.carousels)
+
+    workers = [int(value) for value in args.workers.split(",") if value]
+    sections = ["functions", "endToEndCold", "endToEndWarm"] + [f"throughput_{count}" for count in workers]
+    results = {"environment": describe_environment(),
+               "parameters": {"repeat": args.repeat, "workers": workers, "carousels": args.carousels, "latencyMs": args.latency_ms}}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_fixtures_") as fixtures_dir:
+        # Fixtures écrites dans un sous-processus : ce processus (serveur HTTP) reste léger
+        fixture_files = run_in_subprocess("--write-fixtures", fixtures_dir)
+        results["fixtures"] = {name: {"file": filename, "bytes": os.path.getsize(os.path.join(fixtures_dir, filename))}
+                               for name, filename in fixture_files.items()}
+        server, base_url = serve_directory(fixtures_dir, latency_ms=args.latency_ms)
+        try:
+            for section in sections:
+                print(f"Section {section}...", file=sys.stderr)
+                section_result = run_in_subprocess("--section", section, base_url, json.dumps(fixture_files),
+                                                   "--repeat", str(args.repeat), "--carousels", str(args.carousels))
+                if section.startswith("throughput_"):
+                    results.setdefault("throughput", []).append(dict(section_result["result"], memory=section_result["memory"]))
+                else:
+                    results[section] = section_result
+        finally:
+            server.shutdown()
+
+    output = json.dumps(results, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+        print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
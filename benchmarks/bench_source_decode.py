@@ -0,0 +1,92 @@
+# benchmarks/bench_source_decode.py
+# Décodage + recadrage 1080x1080 des images sources volumineuses : temps et pic de mémoire (RSS),
+# chargement complet en RGBA (ancien chemin) contre open_image_for_fit (draft JPEG / reduce, RGB).
+# Chaque mesure tourne dans un sous-processus pour que le pic de RSS lui soit propre (ru_maxrss
+# est hérité du processus parent : les fixtures sont donc elles aussi générées dans un sous-processus).
+#
+#   python benchmarks/bench_source_decode.py [--repeat 3]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from _common import app_logs_to_stderr, load_app_module, peak_rss_kib, write_image_fixture
+
+FIXTURES = [
+    ("jpeg_4000x3000", (4000, 3000), "JPEG"),
+    ("jpeg_6000x4000", (6000, 4000), "JPEG"),
+    ("jpeg_1600x1200", (1600, 1200), "JPEG"),
+    ("png_4000x3000", (4000, 3000), "PNG"),
+    ("png_alpha_3000x2000", (3000, 2000), "PNG_ALPHA"),
+]
+MODES = ["full_rgba", "draft_reduce"]
+
+
+def write_fixtures(directory):
+    paths = {}
+    for name, size, kind in FIXTURES:
+        path = os.path.join(directory, f"{name}.{'jpg' if kind == 'JPEG' else 'png'}")
+        paths[name] = write_image_fixture(path, size, kind, seed=len(name))
+    return paths
+
+
+def run_worker(mode, path, repeat):
+    from PIL import Image, ImageOps
+
+    index = load_app_module()
+    with open(path, "rb") as fixture_file:
+        data = fixture_file.read()
+    baseline_rss = peak_rss_kib()
+    durations_ms = []
+    with app_logs_to_stderr():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if mode == "full_rgba":
+                img = Image.open(BytesIO(data)).convert("RGBA")
+                fitted = ImageOps.fit(img, index.IMAGE_SIZE, Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+            else:
+                img = index.open_image_for_fit(data, index.IMAGE_SIZE, path)
+                fitted = index.resize_and_crop_to_square(img, index.IMAGE_SIZE)
+            durations_ms.append((time.perf_counter() - start) * 1000)
+            decoded_size = img.size
+            del img, fitted
+    print(json.dumps({
+        "decodedSize": decoded_size,
+        "medianMs": round(sorted(durations_ms)[len(durations_ms) // 2], 2),
+        "peakRssDeltaMiB": round((peak_rss_kib() - baseline_rss) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage des images sources")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--write-fixtures", metavar="DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return run_worker(args.worker[0], args.worker[1], args.repeat)
+    if args.write_fixtures:
+        return print(json.dumps(write_fixtures(args.write_fixtures)))
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_source_decode_") as fixtures_dir:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--write-fixtures", fixtures_dir],
+                                   check=True, capture_output=True, text=True)
+        for name, path in json.loads(completed.stdout).items():
+            row = {"fixture": name, "fileBytes": os.path.getsize(path)}
+            for mode in MODES:
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--worker", mode, path, "--repeat", str(args.repeat)],
+                    check=True, capture_output=True, text=True,
+                )
+                row[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
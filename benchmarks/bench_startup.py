@@ -0,0 +1,74 @@
+# benchmarks/bench_startup.py
+# Démarrage à froid : temps d'import de api/index.py, durée du warm-up et temps jusqu'au premier
+# carrousel, avec ou sans warm_up() préalable. Chaque mesure part d'un nouveau processus Python
+# (comme une nouvelle instance Lambda) ; les images sont servies par un serveur HTTP local.
+#
+#   python benchmarks/bench_startup.py [--repeat 5]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import (app_logs_to_stderr, isolate_app_storage, load_app_module, make_hotel_payloads, serve_directory,
+                     summarize, write_image_fixture)
+
+MODES = ["lazy", "warm_up"]
+
+
+def run_worker(mode, base_url):
+    started_at = time.perf_counter()
+    index = load_app_module()
+    imported_at = time.perf_counter()
+    result = {"importMs": (imported_at - started_at) * 1000, "requestsImported": "requests" in sys.modules}
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as work_dir, app_logs_to_stderr():
+        isolate_app_storage(index, work_dir)
+        if mode == "warm_up":
+            index.warm_up()
+        warmed_at = time.perf_counter()
+        payload = make_hotel_payloads([f"{base_url}/photo_0.jpg", f"{base_url}/photo_1.jpg"], amenity_counts=(3,))["name_medium-amenities_3"]
+        index.generate_and_save_carousel(payload)
+        first_carousel_at = time.perf_counter()
+        index.generate_and_save_carousel(dict(payload, hotelName=payload["hotelName"] + " bis"))
+        second_carousel_at = time.perf_counter()
+    result.update({
+        "warmUpMs": (warmed_at - imported_at) * 1000,
+        "firstCarouselMs": (first_carousel_at - warmed_at) * 1000,
+        "timeToFirstCarouselMs": (first_carousel_at - started_at) * 1000,
+        "secondCarouselMs": (second_carousel_at - first_carousel_at) * 1000,
+    })
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage à froid")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "BASE_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return run_worker(*args.worker)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_startup_fixtures_") as fixtures_dir:
+        for position in range(2):
+            write_image_fixture(os.path.join(fixtures_dir, f"photo_{position}.jpg"), (1600, 1200), "JPEG", seed=position)
+        server, base_url = serve_directory(fixtures_dir)
+        try:
+            for mode in MODES:
+                runs = []
+                for _ in range(args.repeat):
+                    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", mode, base_url],
+                                               check=True, capture_output=True, text=True)
+                    runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+                results[mode] = {metric: summarize([run[metric] for run in runs])
+                                 for metric in ("importMs", "warmUpMs", "firstCarouselMs", "timeToFirstCarouselMs", "secondCarouselMs")}
+                results[mode]["requestsImportedAtStartup"] = any(run["requestsImported"] for run in runs)
+        finally:
+            server.shutdown()
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
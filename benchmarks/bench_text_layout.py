@@ -0,0 +1,68 @@
+# benchmarks/bench_text_layout.py
+# Temps de mise en page du texte par slide : chargement des polices + mesures getbbox,
+# avant (ImageFont.truetype à chaque slide, sans mémoïsation) et après (registre + cache de métriques).
+#
+#   python benchmarks/bench_text_layout.py [--repeat 200]
+import argparse
+import json
+import textwrap
+
+from PIL import ImageFont
+
+from _common import load_app_module, summarize, time_call
+
+SAMPLE_SLIDES = [
+    ("Hôtel Le Grand Paris Élysée", "9.1", "Piscine intérieure chauffée"),
+    ("Ibis Budget Lyon Centre Gare Part-Dieu", "7.8", "Wifi gratuit"),
+    ("Riad Dar Anika", "9.6", "Petit-déjeuner inclus"),
+]
+
+
+def layout_slide_text(index, load_font, measure, hotel_name, rating, amenity_text):
+    """Reproduit les appels de police et de mesure de create_first_slide + create_amenity_image_slide."""
+    font_hotel_name = load_font(index.FONT_SHRIKHAND_PATH, index.SLIDE1_HOTEL_NAME_FONT_SIZE)
+    font_rating_text = load_font(index.FONT_BOLD_PATH, index.SLIDE1_RATING_TEXT_FONT_SIZE)
+    for line in textwrap.wrap(hotel_name, width=18): measure(line, font_hotel_name)
+    measure("Noté : 9.9", font_rating_text)
+    measure(f"Noté : {rating}", font_rating_text)
+
+    font_equipment = load_font(index.FONT_BOLD_PATH, index.IMAGE_SLIDE_EQUIPMENT_FONT_SIZE)
+    font_footer_hotel_name = load_font(index.FONT_BOLD_PATH, index.IMAGE_SLIDE_FOOTER_HOTEL_NAME_SIZE)
+    font_footer_rating = load_font(index.FONT_BOLD_PATH, index.IMAGE_SLIDE_FOOTER_RATING_SIZE)
+    for line in textwrap.wrap(amenity_text, width=16): measure(line, font_equipment)
+    measure(textwrap.shorten(hotel_name, width=35, placeholder="..."), font_footer_hotel_name)
+    measure(f"{rating}", font_footer_rating)
+
+
+def uncached_dimensions(text_string, font):
+    bbox = font.getbbox(text_string)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+def run_layout_pass(index, load_font, measure):
+    for hotel_name, rating, amenity_text in SAMPLE_SLIDES:
+        layout_slide_text(index, load_font, measure, hotel_name, rating, amenity_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la mise en page du texte par slide")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    index = load_app_module()
+    before = time_call(run_layout_pass, args.repeat, index, ImageFont.truetype, uncached_dimensions)
+    run_layout_pass(index, index.get_font, index.get_text_dimensions) # Préchauffe le cache de métriques
+    after = time_call(run_layout_pass, args.repeat, index, index.get_font, index.get_text_dimensions)
+
+    per_slide = len(SAMPLE_SLIDES)
+    results = {
+        "before": summarize([d / per_slide for d in before]),
+        "after": summarize([d / per_slide for d in after]),
+        "textMetricsCache": index.get_text_bbox.cache_info()._asdict(),
+    }
+    results["speedup"] = round(results["before"]["medianMs"] / max(results["after"]["medianMs"], 1e-6), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
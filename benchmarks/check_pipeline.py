@@ -0,0 +1,192 @@
+# benchmarks/check_pipeline.py
+# Vérifications de comportement du pipeline (cas limites relevés en revue), sans Internet : images
+# servies par un serveur HTTP local, caches de l'application redirigés vers un dossier temporaire.
+# Code de sortie 1 si une vérification échoue.
+#
+#   python benchmarks/check_pipeline.py
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+from _common import app_logs_to_stderr, isolate_app_storage, load_app_module, serve_directory, write_image_fixture
+
+
+def check_undecodable_source_not_cached(index, base_url, work_dir):
+    """Une source téléchargée mais indécodable donne une slide de remplacement, jamais mise en cache."""
+    isolate_app_storage(index, work_dir)
+    payload = {"hotelName": "Hôtel Vérification", "rating": "8.0", "popularAmenities": ["Spa"],
+               "imageUrls": [f"{base_url}/photo.jpg", f"{base_url}/not_an_image.jpg", f"{base_url}/truncated.jpg"]}
+    for _ in range(2):
+        _, _, slide_reports = index.generate_and_save_carousel(payload)
+    cached_files = {report["file"] for report in slide_reports if report["cached"]}
+    assert cached_files == {"00_cover.png", "01_image.png"}, f"slides reprises du cache : {sorted(cached_files)}"
+    assert len(os.listdir(index.RENDER_CACHE_DIR)) == 2, f"cache de rendu : {sorted(os.listdir(index.RENDER_CACHE_DIR))}"
+    # Un seul recadrage par slide rendue : photo.jpg (1er passage) et truncated.jpg (deux passages)
+    fitted_stats = index.fitted_image_cache.stats()
+    assert fitted_stats["hits"] + fitted_stats["misses"] == 3, f"recherches dans le cache des images recadrées : {fitted_stats}"
+
+
+def check_batch_rejects_non_utf8_body(index, base_url, work_dir):
+    """Un corps de lot qui n'est pas de l'UTF-8 est refusé en 400 (et non une erreur 500)."""
+    client = index.app.test_client()
+    for content_type in ("application/json", "application/x-ndjson"):
+        response = client.post("/api/generate/batch", data=b'[{"hotelName": "H\xe9tel"}]', content_type=content_type)
+        assert response.status_code == 400, f"{content_type} : HTTP {response.status_code}"
+
+
+def check_batch_cancelled_on_disconnect(index, base_url, work_dir):
+    """Un lot n'occupe qu'une fenêtre de l'exécuteur ; fermer le flux (client parti) annule les hôtels restants."""
+    original_generate_batch_item = index.generate_batch_item
+    started_items = []
+    started_lock = threading.Lock()
+
+    def slow_generate_batch_item(*args):
+        with started_lock:
+            started_items.append(args[0])
+        time.sleep(0.02)
+        return original_generate_batch_item(*args)
+
+    index.generate_batch_item = slow_generate_batch_item
+    try:
+        results = index.iter_batch_results([None] * 200, base_url)
+        next(results)
+        results.close()
+        time.sleep(0.2) # Hôtels déjà démarrés : ils se terminent
+    finally:
+        index.generate_batch_item = original_generate_batch_item
+    assert len(started_items) <= index.BATCH_MAX_PENDING_HOTELS * 2, f"{len(started_items)} hôtels traités sur 200 après déconnexion"
+
+
+def check_bright_region_selects_white_text(index, base_url, work_dir):
+    """Sur une zone claire, le texte d'équipement passe au blanc ; sur une zone moyenne, il reste jaune."""
+    isolate_app_storage(index, work_dir)
+    text_colors = (index.IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR, index.IMAGE_SLIDE_FOOTER_TEXT_COLOR)
+    box = (0, 0, 400, 200)
+    for luma, expected_color in ((240, index.IMAGE_SLIDE_FOOTER_TEXT_COLOR), (128, index.IMAGE_SLIDE_EQUIPMENT_TEXT_COLOR)):
+        region = Image.new("RGB", box[2:], (luma, luma, luma))
+        style = index.get_region_overlay_style(f"luma_{luma}", region, box, text_colors)
+        assert style.text_color == expected_color, f"luminance {luma} : {style}"
+        assert style.alpha <= index.BRAND_TEXT_MAX_ALPHA, f"luminance {luma} : voile {style.alpha}"
+
+
+def check_memory_hit_survives_evictions(index, base_url, work_dir):
+    """Succès mémoire : l'entrée disque est rafraîchie, et l'image reste disponible si les deux caches l'ont évincée."""
+    isolate_app_storage(index, work_dir)
+    url = f"{base_url}/photo.jpg"
+    index.get_fitted_source_image(index.fetch_source_image(url))
+    meta_path = index._disk_cache_paths(url)[1]
+    os.utime(meta_path, (0, 0))
+    source_image = index.fetch_source_image(url)
+    assert source_image.data is None, "le succès mémoire a relu le cache disque"
+    assert os.path.getmtime(meta_path) > 0, "date d'accès de l'entrée disque non rafraîchie"
+    index.fitted_image_cache = index.ByteBudgetLRU(index.SOURCE_CACHE_MEMORY_BUDGET, index._image_size_in_bytes)
+    for path in index._disk_cache_paths(url):
+        os.remove(path)
+    assert index.get_fitted_source_image(source_image) is not None, "image perdue après éviction mémoire et disque"
+
+
+def check_uncommon_source_formats_decoded(index, base_url, work_dir):
+    """Les sources BMP et TIFF (plugins Pillow non préchargés) sont toujours décodées et mises en cache."""
+    isolate_app_storage(index, work_dir)
+    rejected_before = index.disk_cache_counters["rejected"]
+    for filename in ("photo.bmp", "photo.tiff"):
+        source_image = index.fetch_source_image(f"{base_url}/{filename}")
+        assert source_image is not None, f"{filename} rejeté"
+        assert index.get_fitted_source_image(source_image) is not None, f"{filename} non décodé"
+    assert index.disk_cache_counters["rejected"] == rejected_before, "source comptée comme rejetée"
+
+
+def check_batch_item_plans_slides_once(index, base_url, work_dir):
+    """Un hôtel d'un lot consulte le cache de rendu une fois par slide (pas de seconde planification au rendu)."""
+    isolate_app_storage(index, work_dir)
+    payload = {"hotelName": "Hôtel Lot", "rating": "8.5", "popularAmenities": ["Spa", "Piscine"],
+               "imageUrls": [f"{base_url}/photo.jpg", f"{base_url}/photo.bmp"]}
+    render_pool_unavailable = index._render_process_pool_unavailable
+    index._render_process_pool_unavailable = True # Rendu dans ce processus : ses compteurs sont ceux lus ici
+    try:
+        for _ in range(2):
+            before = index.get_render_cache_stats()
+            result = index.generate_batch_item(0, payload, base_url)
+            after = index.get_render_cache_stats()
+            assert result["status"] == "success", result
+            lookups = after["hits"] + after["misses"] - before["hits"] - before["misses"]
+            assert lookups == 3, f"{lookups} consultations du cache de rendu pour 3 slides"
+    finally:
+        index._render_process_pool_unavailable = render_pool_unavailable
+
+
+def _generate_stored_carousel(index, base_url, hotel_name):
+    payload = {"hotelName": hotel_name, "rating": "9.0", "popularAmenities": ["Spa"], "imageUrls": [f"{base_url}/photo.jpg"]}
+    folder, _, slide_reports = index.generate_and_save_carousel(payload)
+    return folder, slide_reports[0]["file"]
+
+
+def check_output_store_eviction(index, base_url, work_dir):
+    """Budget puis durée de vie : le dossier le moins récemment servi est supprimé, et ses images répondent 404."""
+    isolate_app_storage(index, work_dir)
+    index.output_store = index.OutputStore(index.OUTPUT_DIR, index.OUTPUT_STORE_MAX_BYTES, 3600, 3600)
+    client = index.app.test_client()
+    first_folder, first_file = _generate_stored_carousel(index, base_url, "Hôtel Premier")
+    index.output_store.max_bytes = index.output_store.stats()["bytes"] * 3 // 2 # Place pour un seul carrousel
+    second_folder, second_file = _generate_stored_carousel(index, base_url, "Hôtel Second")
+    assert not os.path.exists(os.path.join(index.OUTPUT_DIR, first_folder)), "dossier hors budget toujours sur disque"
+    assert client.get(f"/generated_images/{first_folder}/{first_file}").status_code == 404, "image évincée encore servie"
+    assert client.get(f"/generated_images/{second_folder}/{second_file}").status_code == 200, "dossier récent évincé"
+    index.output_store.ttl_seconds = 0
+    assert index.output_store.evict() == 1, "dossier expiré non évincé"
+    assert client.get(f"/generated_images/{second_folder}/{second_file}").status_code == 404, "image expirée encore servie"
+    assert index.output_store.stats()["evictions"] == 2, index.output_store.stats()
+
+
+def check_render_worker_store_never_evicts(index, base_url, work_dir):
+    """L'index d'un processus de rendu n'évince jamais : les dossiers restent servis par le processus parent."""
+    isolate_app_storage(index, work_dir)
+    index.output_store = index.OutputStore(index.OUTPUT_DIR, 1, 3600, 3600) # Tout dossier dépasse le budget
+    index.output_store.release_ownership()
+    folders = [_generate_stored_carousel(index, base_url, f"Hôtel Rendu {position}")[0] for position in range(2)]
+    for folder in folders:
+        assert os.path.exists(os.path.join(index.OUTPUT_DIR, folder)), f"{folder} supprimé par un processus de rendu"
+    assert index.output_store.stats()["evictions"] == 0, index.output_store.stats()
+
+
+CHECKS = [check_undecodable_source_not_cached, check_batch_rejects_non_utf8_body, check_batch_cancelled_on_disconnect,
+          check_bright_region_selects_white_text, check_memory_hit_survives_evictions, check_uncommon_source_formats_decoded,
+          check_batch_item_plans_slides_once, check_output_store_eviction, check_render_worker_store_never_evicts]
+
+
+def main():
+    index = load_app_module()
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="check_pipeline_") as fixtures_dir:
+        photo_path = write_image_fixture(os.path.join(fixtures_dir, "photo.jpg"), (1200, 900), "JPEG")
+        with open(photo_path, "rb") as photo_file:
+            photo_bytes = photo_file.read()
+        with Image.open(photo_path) as photo:
+            for extension in ("bmp", "tiff"):
+                photo.save(os.path.join(fixtures_dir, f"photo.{extension}"))
+        with open(os.path.join(fixtures_dir, "truncated.jpg"), "wb") as truncated_file:
+            truncated_file.write(photo_bytes[:len(photo_bytes) // 3]) # En-tête JPEG valide, pixels manquants
+        with open(os.path.join(fixtures_dir, "not_an_image.jpg"), "w", encoding="utf-8") as html_file:
+            html_file.write("<html><body>Not found</body></html>")
+        server, base_url = serve_directory(fixtures_dir)
+        try:
+            for check in CHECKS:
+                with tempfile.TemporaryDirectory(prefix=f"{check.__name__}_") as work_dir:
+                    try:
+                        with app_logs_to_stderr():
+                            check(index, base_url, work_dir)
+                        print(f"OK    {check.__name__}")
+                    except AssertionError as e:
+                        failures += 1
+                        print(f"ÉCHEC {check.__name__}: {e}")
+        finally:
+            server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/compare_results.py
+# Compare deux résultats de bench_pipeline.py (par ex. main contre une branche) et signale les écarts.
+# Code de sortie 1 si une mesure régresse au-delà du seuil.
+#
+#   python benchmarks/compare_results.py avant.json apres.json [--threshold 10]
+import argparse
+import json
+import sys
+
+# Métrique -> True si une valeur plus haute est meilleure
+COMPARED_METRICS = {"medianMs": False, "p95Ms": False, "peakRssDeltaMiB": False, "carouselsPerSecond": True}
+
+
+def flatten_metrics(node, path=""):
+    """{chemin: valeur} pour chaque métrique comparée ; les listes sont indexées par leur nombre de workers."""
+    metrics = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            child_path = f"{path}.{key}" if path else key
+            if key in COMPARED_METRICS and isinstance(value, (int, float)):
+                metrics[child_path] = value
+            else:
+                metrics.update(flatten_metrics(value, child_path))
+    elif isinstance(node, list):
+        for position, value in enumerate(node):
+            label = value.get("workers", position) if isinstance(value, dict) else position
+            metrics.update(flatten_metrics(value, f"{path}[{label}]"))
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare deux fichiers de résultats de bench_pipeline.py")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Écart signalé, en pourcentage")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as baseline_file, open(args.candidate, encoding="utf-8") as candidate_file:
+        baseline = flatten_metrics(json.load(baseline_file))
+        candidate = flatten_metrics(json.load(candidate_file))
+
+    regressions = 0
+    for metric_path in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[metric_path], candidate[metric_path]
+        if not before: continue
+        change = (after - before) / before * 100
+        if abs(change) < args.threshold: continue
+        higher_is_better = COMPARED_METRICS[metric_path.rsplit(".", 1)[-1]]
+        is_regression = (change < 0) if higher_is_better else (change > 0)
+        regressions += is_regression
+        print(f"{'RÉGRESSION ' if is_regression else 'amélioration'} {metric_path}: {before:g} -> {after:g} ({change:+.1f}%)")
+    for metric_path in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"absent d'un des deux fichiers : {metric_path}")
+    print(f"{regressions} régression(s) au-delà de {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()